@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+""" Generates synthetic rws files and times parse.py actions against them"""
+from argparse import ArgumentParser
+from configparser import ConfigParser
+import base64
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+from parse import ACTIONS, SKILLS
+
+PARSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parse.py')
+REBUILD = os.path.join(os.path.dirname(PARSE), 'rebuild.py')
+BENCH_ACTIONS = [action for action in ACTIONS if action != 'test']
+MAP_SIZE = 250
+# Sealed ancient rooms, each with occupied caskets and loot
+SHRINES = 4
+# Rock and roof ushorts in the map grids, standing in for def short hashes
+ROCK = 0x5a1b
+ROOF = 0x2c3d
+MOUNTAIN = 40
+# Name: arguments to python for commands that should start quickly, run beside a cached bench save
+STARTUP_COMMANDS = {
+    'python': ['-c', 'pass'],
+    'rebuild list': [REBUILD, 'list'],
+    'parse --help': [PARSE, '--help'],
+    'cached report': [PARSE, 'bench', 'animals'],
+}
+
+HEDIFFS = ('Hediff_Injury', 'Hediff_MissingPart', 'Hediff_AddedPart', 'Hediff_Implant', 'HediffWithComps', 'Hediff_Addiction',)
+APPAREL = ('Apparel_Pants', 'Apparel_CollarShirt', 'Apparel_Duster', 'Apparel_Parka', 'Apparel_AdvancedHelmet', 'Apparel_FlakVest', 'Apparel_PowerArmor', 'Apparel_Tuque',)
+FABRICS = ('Cloth', 'DevilstrandCloth', 'Hyperweave', 'Synthread', 'Leather_Plain',)
+QUALITIES = ('Awful', 'Poor', 'Normal', 'Good', 'Excellent', 'Masterwork',)
+WEAPONS = ('Gun_Revolver', 'Gun_AssaultRifle', 'Gun_BoltActionRifle', 'MeleeWeapon_LongSword', 'MeleeWeapon_Knife',)
+RESOURCES = ('Steel', 'WoodLog', 'Cloth', 'Silver', 'Plasteel', 'Gold', 'Uranium', 'BlocksGranite', 'BlocksMarble',
+    'Meat_Cow', 'RawPotatoes', 'RawRice', 'EggChickenUnfertilized', 'Milk', 'MealSimple', 'MealFine', 'Pemmican',
+    'Beer', 'SmokeleafJoint', 'Neutroamine', 'DevilstrandCloth', 'Hay',)
+MEDICINE = ('MedicineHerbal', 'MedicineIndustrial', 'MedicineUltratech',)
+PLANTS = ('Plant_Potato', 'Plant_Rice', 'Plant_Corn', 'Plant_Cotton', 'Plant_Haygrass', 'Plant_Devilstrand',
+    'Plant_Healroot', 'Plant_Berry', 'Plant_Agave', 'HealrootWild', 'Plant_TreeOak', 'Plant_TreeDrago',
+    'Plant_SaguaroCactus', 'Plant_Ambrosia', 'Plant_Grass',)
+BASIN_PLANTS = ('Plant_Rice', 'Plant_Healroot', 'Plant_Cotton', 'Plant_Smokeleaf',)
+RECIPES = ('Make_Apparel_Parka', 'Make_Apparel_Pants', 'CookMealFine', 'CookMealFineBulk', 'Make_StoneBlocksGranite',
+    'Make_MedicineIndustrial', 'Make_ComponentIndustrial', 'ButcherCorpseFlesh',)
+REPEAT_MODES = ('TargetCount', 'RepeatCount', 'Forever',)
+# Real mind states have fields with text, which is what the reports tell animals by
+MIND_STATE = '<mindState><duty IsNull="True" /><lastJobTag>Idle</lastJobTag></mindState>'
+ANIMALS = ('Muffalo', 'Cow', 'Husky', 'Chicken', 'Alpaca', 'Boomalope', 'Deer', 'Squirrel',)
+
+class SaveWriter:
+    """ Writes one synthetic save. Everything is drawn from a seeded Random so runs repeat."""
+    def __init__(self, f, seed=0):
+        self.f = f
+        self.random = random.Random(seed)
+        self.ids = 0
+
+    def write(self, *parts):
+        self.f.write(''.join(parts))
+
+    def next_id(self, prefix):
+        self.ids += 1
+        return f"{prefix}{self.ids}"
+
+    def pos(self, at=None):
+        x, z = at or (self.random.randrange(MAP_SIZE), self.random.randrange(MAP_SIZE),)
+        return f"<pos>({x}, 0, {z})</pos>"
+
+    def item(self, tag, thing_def, cls=None, stuff=None, quality=None, count=None, extra='', at=None):
+        r = self.random
+        attrs = f' Class="{cls}"' if cls else ''
+        parts = [f"<{tag}{attrs}><def>{thing_def}</def><id>{self.next_id(thing_def)}</id>"]
+        if tag == 'thing':
+            parts.append(f"<map>0</map>{self.pos(at)}")
+        parts.append(f"<health>{r.randint(10, 40) * 5}</health>")
+        if stuff:
+            parts.append(f"<stuff>{stuff}</stuff>")
+        if quality:
+            parts.append(f"<quality>{quality}</quality>")
+        if count:
+            parts.append(f"<stackCount>{count}</stackCount>")
+        parts.append(extra)
+        parts.append(f"</{tag}>")
+        return ''.join(parts)
+
+    def pawn(self, tag, faction='Faction_10', kind='Colonist', prisoner=False):
+        r = self.random
+        pawn_id = self.next_id('Human')
+        cls = ' Class="Pawn"' if tag == 'thing' else ''
+        self.write(f"<{tag}{cls}><def>Human</def><id>{pawn_id}</id>")
+        if tag == 'thing':
+            self.write(f"<map>0</map>{self.pos()}")
+        self.write(f"<faction>{faction}</faction><kindDef>{kind}</kindDef>",
+            f'<name Class="NameTriple"><first>{pawn_id}</first><nick>{pawn_id}</nick><last>Synth</last></name>',
+            MIND_STATE,
+            '<healthTracker><hediffSet><hediffs>')
+        for _ in range(r.randint(0, 6)):
+            permanent = '<isPermanent>True</isPermanent>' if r.random() < .5 else ''
+            self.write(f'<li Class="{r.choice(HEDIFFS)}"><def>Hediff{r.randrange(20)}</def><ageTicks>{r.randrange(10**6)}</ageTicks>',
+                f"<part><body>Human</body><index>{r.randrange(64)}</index></part><severity>{r.random() * 10:.2f}</severity>{permanent}</li>")
+        self.write('</hediffs></hediffSet></healthTracker>',
+            f'<needs><needs><li Class="Need_Mood"><def>Mood</def><curLevel>{r.random():.3f}</curLevel></li></needs></needs>',
+            '<apparel><wornApparel><innerList>')
+        for apparel in r.sample(APPAREL, 4):
+            self.write(self.item('li', apparel, stuff=r.choice(FABRICS), quality=r.choice(QUALITIES)))
+        self.write('</innerList></wornApparel></apparel><equipment><equipment><innerList>')
+        self.write(self.item('li', r.choice(WEAPONS), quality=r.choice(QUALITIES)))
+        self.write('</innerList></equipment></equipment><inventory><innerContainer><innerList>')
+        self.write(self.item('li', r.choice(MEDICINE), count=r.randint(1, 5)))
+        self.write('</innerList></innerContainer></inventory>')
+        if prisoner:
+            self.write(f"<guest><hostFaction>{faction}</hostFaction><guestStatus>Prisoner</guestStatus><resistance>{r.random() * 30:.1f}</resistance></guest>")
+        else:
+            self.write('<guest />')
+        self.write('<skills><skills>')
+        for skill in SKILLS:
+            passion = r.choice(('', '<passion>Minor</passion>', '<passion>Major</passion>',))
+            self.write(f"<li><def>{skill}</def><level>{r.randint(0, 20)}</level>{passion}<xpSinceLastLevel>{r.randrange(1000)}</xpSinceLastLevel></li>")
+        self.write(f"</skills></skills></{tag}>")
+
+    def things(self, count):
+        """ Loose items in the proportions a late colony has them """
+        r = self.random
+        for _ in range(count):
+            roll = r.random()
+            if roll < .45:
+                self.write(self.item('thing', r.choice(RESOURCES), cls='ThingWithComps', count=r.randint(1, 75)))
+            elif roll < .55:
+                self.write(self.item('thing', r.choice(MEDICINE), cls='Medicine', count=r.randint(1, 25)))
+            elif roll < .75:
+                corpse = '<wornByCorpse>True</wornByCorpse>' if r.random() < .2 else ''
+                self.write(self.item('thing', r.choice(APPAREL), cls='Apparel', stuff=r.choice(FABRICS), quality=r.choice(QUALITIES), extra=corpse))
+            elif roll < .85:
+                biocoded = '<biocoded>True</biocoded>' if r.random() < .1 else ''
+                self.write(self.item('thing', r.choice(WEAPONS), cls='ThingWithComps', quality=r.choice(QUALITIES), extra=biocoded))
+            elif roll < .9:
+                self.write(self.item('thing', 'UnfinishedSculpture', cls='UnfinishedThing', stuff='WoodLog',
+                    extra='<recipe>Make_SculptureSmall</recipe><creatorName>Synth</creatorName>'))
+            elif roll < .95:
+                inner = self.item('li', 'Table2x2c', stuff=r.choice(('WoodLog', 'BlocksGranite', 'Steel',)), quality=r.choice(QUALITIES))
+                self.write(self.item('thing', 'MinifiedThing', cls='MinifiedThing', extra=f"<innerContainer><innerList>{inner}</innerList></innerContainer>"))
+            elif roll < .97:
+                inner = f"<li><def>Human</def><id>{self.next_id('Ancient')}</id></li>" if r.random() < .8 else ''
+                self.write(self.item('thing', 'AncientCryptosleepCasket', cls='Building_AncientCryptosleepCasket',
+                    extra=f"<innerContainer><innerList>{inner}</innerList></innerContainer>"))
+            elif roll < .98:
+                self.write(self.item('thing', 'SteamGeyser', cls='Building'))
+            else:
+                faction = '<faction>Faction_10</faction>' if r.random() < .5 else ''
+                animal = r.choice(ANIMALS)
+                self.write(self.item('thing', animal, cls='Pawn', extra=f"{faction}<kindDef>{animal}</kindDef>{MIND_STATE}"))
+
+    def plants(self, count):
+        r = self.random
+        for _ in range(count):
+            sown = '<sown>True</sown>' if r.random() < .5 else ''
+            growth = '1' if r.random() < .3 else f"{r.random():.4f}"
+            self.write(self.item('thing', r.choice(PLANTS), cls='Plant', extra=f"<growth>{growth}</growth><age>{r.randrange(10**6)}</age>{sown}"))
+
+    def basins(self, count):
+        r = self.random
+        for _ in range(count):
+            rot = r.choice(('', '<rot>1</rot>', '<rot>2</rot>', '<rot>3</rot>',))
+            power = '<powerOn>False</powerOn>' if r.random() < .1 else ''
+            self.write(self.item('thing', 'HydroponicsBasin', cls='Building_PlantGrower',
+                extra=f"{rot}{power}<plantDefToGrow>{r.choice(BASIN_PLANTS)}</plantDefToGrow>"))
+
+    def worktables(self, bills):
+        r = self.random
+        while bills > 0:
+            self.write(f'<thing Class="Building_WorkTable"><def>TableMachining</def><id>{self.next_id("Table")}</id><map>0</map>{self.pos()}<billStack><bills>')
+            for _ in range(min(bills, 5)):
+                self.write(f'<li Class="Bill_Production"><recipe>{r.choice(RECIPES)}</recipe>',
+                    f"<suspended>{r.choice(('False', 'False', 'True',))}</suspended><repeatMode>{r.choice(REPEAT_MODES)}</repeatMode>",
+                    f"<repeatCount>{r.randint(0, 10)}</repeatCount><targetCount>{r.randint(0, 50)}</targetCount>",
+                    f"<ingredientFilter><allowedDefs><li>{r.choice(FABRICS)}</li></allowedDefs></ingredientFilter></li>")
+                bills -= 1
+            self.write('</bills></billStack></thing>')
+
+    def shrine_rects(self, count):
+        """ (left, bottom, right, top) of the walls of each shrine, clear of the mountain """
+        r = self.random
+        rects = []
+        for _ in range(count):
+            left, bottom = r.randrange(5, MAP_SIZE - MOUNTAIN - 15), r.randrange(5, MAP_SIZE - MOUNTAIN - 15)
+            rects.append((left, bottom, left + r.randint(5, 9), bottom + r.randint(5, 9),))
+        return rects
+
+    def grid(self, cells):
+        """ ushort cells, by (x, z), as base64 of raw deflate like the save's ...Deflate grids """
+        data = bytearray(MAP_SIZE * MAP_SIZE * 2)
+        for (x, z), value in cells.items():
+            data[(z * MAP_SIZE + x) * 2:(z * MAP_SIZE + x) * 2 + 2] = value.to_bytes(2, 'little')
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        return base64.b64encode(compressor.compress(bytes(data)) + compressor.flush()).decode()
+
+    def map_grids(self, shrines):
+        """ A rock mountain in the north east corner under its own roof, and roofs over the shrines """
+        mountain = range(MAP_SIZE - MOUNTAIN, MAP_SIZE)
+        rock = {(x, z): ROCK for x in mountain for z in mountain}
+        roofs = dict.fromkeys(rock, ROOF)
+        for left, bottom, right, top in shrines:
+            roofs.update(((x, z), ROOF) for x in range(left, right + 1) for z in range(bottom, top + 1))
+        self.write(f"<compressedThingMapDeflate>{self.grid(rock)}</compressedThingMapDeflate>",
+            f"<roofGrid><roofsDeflate>{self.grid(roofs)}</roofsDeflate></roofGrid>",
+            '<zoneManager><allZones><li Class="Zone_Stockpile"><label>Stockpile zone 1</label><cells>')
+        for x in range(100, 120):
+            for z in range(100, 120):
+                self.write(f"<li>({x}, 0, {z})</li>")
+        self.write('</cells></li></allZones></zoneManager>')
+
+    def shrines(self, rects):
+        r = self.random
+        for left, bottom, right, top in rects:
+            for x in range(left, right + 1):
+                for z in range(bottom, top + 1):
+                    if x in (left, right) or z in (bottom, top):
+                        self.write(self.item('thing', 'Wall', cls='Building', stuff='BlocksGranite', at=(x, z,)))
+            inside = lambda: (r.randint(left + 1, right - 1), r.randint(bottom + 1, top - 1),)
+            for _ in range(r.randint(1, 3)):
+                occupant = f"<li><def>Human</def><id>{self.next_id('Ancient')}</id></li>"
+                self.write(self.item('thing', 'AncientCryptosleepCasket', cls='Building_AncientCryptosleepCasket', at=inside(),
+                    extra=f"<innerContainer><innerList>{occupant}</innerList></innerContainer>"))
+            for _ in range(r.randint(2, 5)):
+                self.write(self.item('thing', r.choice(WEAPONS), cls='ThingWithComps', quality=r.choice(QUALITIES), at=inside()))
+
+    def save(self, pawns, things, plants, basins, bills, designations, maps=1):
+        r = self.random
+        self.write('<?xml version="1.0" encoding="utf-8"?>\n<savegame><meta><gameVersion>1.2.2900 rev1078</gameVersion>',
+            '<modIds><li>ludeon.rimworld</li></modIds><modNames><li>Core</li></modNames></meta>',
+            f"<game><tickManager><ticksGame>{r.randrange(10**7)}</ticksGame></tickManager>",
+            '<world><info><name>Synthetic</name><seedString>bench</seedString></info>',
+            '<factionManager><allFactions><li><def>PlayerColony</def><loadID>10</loadID><name>Bench Colony</name></li></allFactions></factionManager>',
+            '<worldPawns><pawnsAlive>')
+        for _ in range(max(pawns // 4, 1)):
+            self.pawn('li', faction=r.choice(('Faction_10', 'Faction_3',)), kind=r.choice(('Colonist', 'Villager',)))
+        self.write('</pawnsAlive><pawnsDead>')
+        for _ in range(max(pawns // 4, 1)):
+            self.pawn('li', faction='Faction_3', kind='Villager')
+        self.write('</pawnsDead></worldPawns></world><maps>')
+        for map_index in range(maps):
+            # The colonists and prisoners are on the first map; every map has its own items, grids and shrines
+            self.write(f"<li><uniqueID>{map_index}</uniqueID>",
+                f"<mapInfo><size>({MAP_SIZE}, 1, {MAP_SIZE})</size></mapInfo>")
+            shrines = self.shrine_rects(SHRINES)
+            self.map_grids(shrines)
+            self.write('<designationManager><allDesignations>')
+            for _ in range(designations):
+                self.write(f"<li><def>{r.choice(('Mine', 'Mine', 'CutPlant', 'Haul',))}</def><target>({r.randrange(MAP_SIZE)}, 0, {r.randrange(MAP_SIZE)})</target></li>")
+            self.write('</allDesignations></designationManager><things>')
+            if map_index == 0:
+                for _ in range(pawns):
+                    self.pawn('thing')
+                for _ in range(max(pawns // 10, 1)):
+                    self.pawn('thing', faction='Faction_3', kind='Villager', prisoner=True)
+            self.things(things)
+            self.plants(plants)
+            self.basins(basins)
+            self.worktables(bills)
+            self.shrines(shrines)
+            self.write('</things></li>')
+        self.write('</maps><questManager><quests>')
+        for quest in range(10):
+            cleaned = '<cleanedUp>True</cleanedUp>' if quest % 3 else ''
+            self.write(f"<li><id>{quest}</id><name>Quest {quest}</name><description>Reward &lt;color=#ffffff&gt;{quest}&lt;/color&gt;</description>{cleaned}</li>")
+        self.write('</quests></questManager></game></savegame>\n')
+
+def generate(path, pawns, things, plants, basins, bills, designations, seed=0, maps=1):
+    with open(path, 'w') as f:
+        SaveWriter(f, seed).save(pawns, things, plants, basins, bills, designations, maps)
+
+def measure(command, cwd):
+    """ Wall seconds and peak RSS in KB of one run """
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - started
+    if os.waitstatus_to_exitcode(status):
+        raise RuntimeError(f"{' '.join(command)} exited with {os.waitstatus_to_exitcode(status)}")
+    return {'wall': round(wall, 4), 'max_rss_kb': usage.ru_maxrss}
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(PARSE), capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+def write_config(workdir, save):
+    """ A config in workdir with the save as the one faction, bench """
+    os.makedirs(os.path.join(workdir, 'local'))
+    config = ConfigParser()
+    config['path'] = {'saves': os.path.dirname(save) + os.sep}
+    config['bench'] = {'file': save}
+    with open(os.path.join(workdir, 'local', 'parse.cnf'), 'w') as f:
+        config.write(f)
+
+def bench(args):
+    workdir = tempfile.mkdtemp(prefix='rwbench')
+    try:
+        save = args.save or os.path.join(workdir, 'bench.rws')
+        if not args.save:
+            generate(save, args.pawns, args.things, args.plants, args.basins, args.bills, args.designations, args.seed, args.maps)
+        write_config(workdir, save)
+        results = {}
+        for action in args.actions or BENCH_ACTIONS:
+            command = [sys.executable, PARSE, 'bench', action]
+            results[action] = {'cold': measure(command + ['--no-cache'], workdir)}
+            measure(command, workdir)
+            results[action]['warm'] = measure(command, workdir)
+            print(f"{action:10} cold {results[action]['cold']['wall']:7.2f}s {results[action]['cold']['max_rss_kb']//1024:6} MB"
+                f"   warm {results[action]['warm']['wall']:7.2f}s {results[action]['warm']['max_rss_kb']//1024:6} MB")
+        report = {
+            'commit': git_commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'save_bytes': os.path.getsize(save),
+            'scale': {k: getattr(args, k) for k in ('pawns', 'things', 'plants', 'basins', 'bills', 'designations', 'seed',)},
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    finally:
+        shutil.rmtree(workdir)
+
+def startup(args):
+    """ Best wall time over repeated runs of the commands that need no parsing """
+    workdir = tempfile.mkdtemp(prefix='rwbench')
+    try:
+        save = os.path.join(workdir, 'bench.rws')
+        generate(save, 5, 500, 500, 10, 10, 10)
+        write_config(workdir, save)
+        measure([sys.executable, PARSE, 'bench', 'animals'], workdir)
+        for name, arguments in STARTUP_COMMANDS.items():
+            walls = [measure([sys.executable] + arguments, workdir)['wall'] for _ in range(args.repeat)]
+            print(f"{name:15} {min(walls) * 1000:7.1f} ms")
+    finally:
+        shutil.rmtree(workdir)
+
+def compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"{old['commit'] or args.old} -> {new['commit'] or args.new}")
+    for action in new['results']:
+        if action not in old['results']:
+            continue
+        for run in ('cold', 'warm',):
+            before, after = old['results'][action][run], new['results'][action][run]
+            ratio = after['wall'] / before['wall'] if before['wall'] else 0
+            flag = '  SLOWER' if ratio > 1 + args.tolerance else ''
+            print(f"{action:10} {run}  {before['wall']:7.2f}s -> {after['wall']:7.2f}s ({ratio:4.2f}x)"
+                f"  {before['max_rss_kb']//1024:5} -> {after['max_rss_kb']//1024:5} MB{flag}")
+
+def run(args):
+    if args.command == 'generate':
+        generate(args.output, args.pawns, args.things, args.plants, args.basins, args.bills, args.designations, args.seed, args.maps)
+    elif args.command == 'run':
+        bench(args)
+    elif args.command == 'startup':
+        startup(args)
+    elif args.command == 'compare':
+        compare(args)
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ('generate', 'run',):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--pawns", type=int, default=20, help="colonists on the map")
+        sub.add_argument("--things", type=int, default=20000, help="loose items, caskets, geysers and animals")
+        sub.add_argument("--plants", type=int, default=20000)
+        sub.add_argument("--basins", type=int, default=200, help="hydroponics basins")
+        sub.add_argument("--bills", type=int, default=100)
+        sub.add_argument("--designations", type=int, default=500)
+        sub.add_argument("--seed", type=int, default=0)
+        sub.add_argument("--maps", type=int, default=1, help="maps, each with its items, plants and shrines")
+    subparsers.choices['generate'].add_argument("output", help="rws file to write")
+    subparsers.choices['run'].add_argument("--save", help="time this save instead of generating one")
+    subparsers.choices['run'].add_argument("--actions", nargs='+', choices=BENCH_ACTIONS)
+    subparsers.choices['run'].add_argument("--output", default='bench.json', help="where the JSON results go")
+    sub = subparsers.add_parser('startup')
+    sub.add_argument("--repeat", type=int, default=10, help="runs of each command, the fastest counts")
+    sub = subparsers.add_parser('compare')
+    sub.add_argument("old")
+    sub.add_argument("new")
+    sub.add_argument("--tolerance", type=float, default=.1, help="slowdown flagged above this fraction")
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,106 @@
+""" On-disk cache of the models extracted from rws files"""
+import hashlib
+import os
+import pickle
+
+CACHE_DIR = 'local/cache'
+CACHE_ENTRIES = 8
+CHUNK_SIZE = 1 << 20
+
+def content_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def entry_path(path):
+    """ Cache file for a save; one entry per save path """
+    name = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=8).hexdigest()
+    return os.path.join(CACHE_DIR, f"{name}.pickle")
+
+def load(path, version):
+    """ Returns the cached model for path or None if it is missing or stale
+
+    Size and mtime are checked first. When they have changed the content hash
+    decides, so a save restored byte-for-byte still hits. Such a hit records the
+    new mtime, so the save is not hashed again on the next load."""
+    entry = entry_path(path)
+    try:
+        stat = os.stat(path)
+        with open(entry, 'rb') as f:
+            header = pickle.load(f)
+            if header['version'] != version or header['size'] != stat.st_size:
+                return None
+            if header['mtime'] == stat.st_mtime_ns:
+                model = pickle.load(f)
+            elif header['hash'] == content_hash(path):
+                data = f.read()
+                model = pickle.loads(data)
+                header['mtime'] = stat.st_mtime_ns
+                write(entry, header, data)
+                return model
+            else:
+                return None
+    except (OSError, EOFError, KeyError, pickle.UnpicklingError, AttributeError):
+        return None
+    os.utime(entry)
+    return model
+
+def load_previous(path, version):
+    """ Returns the model cached for path even if the save has changed since, or None """
+    try:
+        with open(entry_path(path), 'rb') as f:
+            if pickle.load(f)['version'] != version:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, KeyError, pickle.UnpicklingError, AttributeError):
+        return None
+
+def store(path, version, model):
+    """ Writes the model for path and evicts the least recently used entries """
+    stat = os.stat(path)
+    header = {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'hash': stored_hash(path, stat),
+        'version': version,
+    }
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    write(entry_path(path), header, pickle.dumps(model, pickle.HIGHEST_PROTOCOL))
+    evict()
+
+def stored_hash(path, stat):
+    """ The content hash in the entry for path if the save has not changed since, so storing
+    a model again (as a report does once it has decoded more) does not read the save again """
+    try:
+        with open(entry_path(path), 'rb') as f:
+            header = pickle.load(f)
+        if header['size'] == stat.st_size and header['mtime'] == stat.st_mtime_ns:
+            return header['hash']
+    except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+        pass
+    return content_hash(path)
+
+def write(entry, header, data):
+    """ Replaces the entry with the header and the pickled model """
+    with open(f"{entry}.tmp", 'wb') as f:
+        pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+        f.write(data)
+    os.replace(f"{entry}.tmp", entry)
+
+def evict(keep=CACHE_ENTRIES):
+    """ Removes all but the most recently used entries. Other processes may be evicting too"""
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.pickle'):
+            try:
+                entries.append((os.path.getmtime(os.path.join(CACHE_DIR, name)), name,))
+            except FileNotFoundError:
+                continue
+    for _, name in sorted(entries, reverse=True)[keep:]:
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
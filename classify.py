@@ -0,0 +1,142 @@
+""" Item categories and names from defNames, by rules that local/items.cnf can add to"""
+from configparser import ConfigParser
+import hashlib
+import re
+import sys
+
+from config import ITEMS_CONFIG
+
+# defName prefix: (category, name to use instead, or None to drop the prefix), tried in order
+PREFIXES = {
+    'Meat_': ('Raw Food', 'Meat',),
+    'Raw': ('Raw Food', None,),
+    'Egg': ('Raw Food', None,),
+}
+# defName: category, for items whose defName does not say
+ITEMS = {
+    'Pemmican': 'Meal',
+}
+# Dropped from the front of the name, which then takes them as its category
+TRUNCATE = ('Blocks', 'Grenade', 'Meal', 'Medicine', 'Unfinished', 'Wool',)
+CATEGORIES = {
+    'Drugs': ('Ambrosia', 'Beer', 'SmokeleafJoint', 'Yayo',),
+    'Medicine': ('Neutroamine', 'Penoxycyline',),
+    'Ores' : ('Gold', 'Jade', 'Plasteel', 'Silver', 'Steel', 'Uranium',),
+    'Raw Food': ('Milk', 'Wort',),
+    'Wool': ('Cloth', 'DevilstrandCloth',),
+}
+# Categories whose items have stuff, quality and hit points
+QUALITY = ('Apparel', 'Gun', 'MeleeWeapon', 'Misc',)
+# Stuff defName: name shown
+STUFF = {
+    'WoodLog': 'Wood',
+}
+# Dropped from the front of stuff defNames
+STUFF_PREFIXES = ('Blocks',)
+
+class Classifier:
+    """ The rules compiled to one prefix pattern and two lookups, with every answer kept by defName,
+    as a save has thousands of stacks but only a few hundred defs"""
+    def __init__(self, prefixes=PREFIXES, items=ITEMS, truncate=TRUNCATE, categories=CATEGORIES, quality=QUALITY, stuff=STUFF, stuff_prefixes=STUFF_PREFIXES):
+        self.prefixes = dict(prefixes)
+        self.prefix_pattern = re.compile('|'.join(re.escape(prefix) for prefix in self.prefixes)) if self.prefixes else None
+        self.items = dict(items)
+        self.truncate = tuple(truncate)
+        self.categories = {name: category for category, names in categories.items() for name in names}
+        self.quality = frozenset(quality)
+        self.stuff = dict(stuff)
+        self.stuff_prefixes = tuple(stuff_prefixes)
+        self.defs = {}
+        self.stuffs = {}
+        # Set for rules read from a config file, so models cached under other rules are not used
+        self.key = None
+
+    @classmethod
+    def from_config(cls, path=ITEMS_CONFIG):
+        """ The default rules with those of the config file, which are tried first.
+        Its sections are [prefixes] (prefix = category[, name]), [items] (defName = category),
+        [categories] (category = names), and name-only lists [truncate], [quality] and [stuff prefixes],
+        and [stuff] (defName = name)"""
+        config = ConfigParser(allow_no_value=True, delimiters=('=',))
+        config.optionxform = str
+        if not config.read(path) or not config.sections():
+            return cls()
+        def section(name):
+            return config[name] if config.has_section(name) else {}
+        def names(value):
+            return tuple(name.strip() for name in (value or '').split(',') if name.strip())
+        def category_of(section_name, key, value):
+            if not names(value):
+                raise SystemExit(f"{path}: {key} in [{section_name}] needs a category")
+            return value
+        prefixes = {}
+        for prefix, value in section('prefixes').items():
+            category, *name = names(category_of('prefixes', prefix, value))
+            prefixes[prefix] = (category, name[0] if name else None,)
+        prefixes.update((prefix, rule,) for prefix, rule in PREFIXES.items() if prefix not in prefixes)
+        categories = {category: names(value) for category, value in section('categories').items()}
+        claimed = {name for listed in categories.values() for name in listed}
+        for category, defaults in CATEGORIES.items():
+            categories[category] = categories.get(category, ()) + tuple(name for name in defaults if name not in claimed)
+        classifier = cls(
+            prefixes,
+            {**ITEMS, **{name: category_of('items', name, value) for name, value in section('items').items()}},
+            tuple(section('truncate')) + TRUNCATE,
+            categories,
+            tuple(section('quality')) + QUALITY,
+            {**STUFF, **section('stuff')},
+            tuple(section('stuff prefixes')) + STUFF_PREFIXES,
+        )
+        with open(path, 'rb') as f:
+            classifier.key = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+        return classifier
+
+    def __call__(self, def_name):
+        """ (category, base name, whether it has stuff and quality) of a defName """
+        try:
+            return self.defs[def_name]
+        except KeyError:
+            pass
+        category = 'Misc'
+        name = def_name
+        match = self.prefix_pattern.match(name) if self.prefix_pattern else None
+        if match:
+            category, replacement = self.prefixes[match.group()]
+            name = replacement or name[match.end():]
+        elif name in self.items:
+            category = self.items[name]
+        elif '_' in name:
+            category, name = name.split('_', 1)
+        for prefix in self.truncate:
+            if name.startswith(prefix):
+                category = prefix
+                name = name[len(prefix):]
+        category = self.categories.get(name, category)
+        result = (sys.intern(category), sys.intern(name), category in self.quality,)
+        self.defs[def_name] = result
+        return result
+
+    def stuff_name(self, stuff):
+        """ How a stuff defName is shown """
+        try:
+            return self.stuffs[stuff]
+        except KeyError:
+            pass
+        name = self.stuff.get(stuff)
+        if name is None:
+            name = stuff
+            for prefix in self.stuff_prefixes:
+                if name.startswith(prefix):
+                    name = name[len(prefix):]
+                    break
+        self.stuffs[stuff] = sys.intern(name)
+        return self.stuffs[stuff]
+
+classifier = None
+
+def get():
+    """ The classifier for the configured rules, read on first use """
+    global classifier
+    if classifier is None:
+        classifier = Classifier.from_config()
+    return classifier
@@ -0,0 +1,36 @@
+""" The config file and its factions, kept apart from parse so the light commands do not load it"""
+CONFIG = 'local/parse.cnf'
+# Rules for categorizing items, such as those of mods
+ITEMS_CONFIG = 'local/items.cnf'
+
+class Options(dict):
+    """ A copy of a faction's section. Keys are case insensitive as they are in the section,
+    so pawn names look up the same levels in a copy as in the config """
+    def __init__(self, section=()):
+        super().__init__()
+        for key, value in dict(section).items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        return super().__getitem__(key.lower())
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key.lower(), value)
+
+    def __contains__(self, key):
+        return super().__contains__(key.lower())
+
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+    def changed(self, section):
+        """ The options that are new or differ from the section's """
+        return {key: value for key, value in self.items() if section.get(key) != value}
+
+def factions(config):
+    to_return = list()
+    skip = ('DEFAULT', 'path',)
+    for x in config:
+        if x not in skip:
+            to_return.append(x)
+    return to_return
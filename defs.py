@@ -0,0 +1,154 @@
+""" Body part names from the game's and mods' Defs, compiled once per mod list and cached on disk"""
+from configparser import ConfigParser
+import hashlib
+import os
+import pickle
+
+from config import CONFIG
+import headers
+
+DEFS_CACHE = 'local/defs'
+# Folders of the official content under the game's Data folder
+OFFICIAL = {
+    'ludeon.rimworld': 'Core',
+    'ludeon.rimworld.royalty': 'Royalty',
+    'ludeon.rimworld.ideology': 'Ideology',
+    'ludeon.rimworld.biotech': 'Biotech',
+    'ludeon.rimworld.anomaly': 'Anomaly',
+}
+# Parts below these are named after them, as "Left Arm Part"
+LIMB_DEFS = ('Arm', 'Leg',)
+# Guards against ParentName loops
+MAX_INHERITANCE = 32
+
+class Bodies:
+    """ Part names by hediff part index for each body, and the body of each race """
+    def __init__(self, key, parts, races):
+        self.key = key
+        self.parts = parts
+        self.races = races
+
+    def of(self, race):
+        """ Part names of the race's body, or None when the Defs do not have it """
+        return self.parts.get(self.races.get(race))
+
+def mod_folders(game, mods=()):
+    """ Folder of each installed mod by lower case package id """
+    from lxml import etree
+    folders = {package_id: os.path.join(game, 'Data', name) for package_id, name in OFFICIAL.items()}
+    for root in [os.path.join(game, 'Mods')] + list(mods):
+        try:
+            names = sorted(os.listdir(root))
+        except OSError:
+            continue
+        for name in names:
+            try:
+                package_id = etree.parse(os.path.join(root, name, 'About', 'About.xml')).findtext('packageId')
+            except (OSError, etree.XMLSyntaxError):
+                continue
+            if package_id:
+                folders[package_id.strip().lower()] = os.path.join(root, name)
+    return folders
+
+def def_files(folder, version):
+    """ The Defs xml of a mod folder: the common ones, then those for the game version (e.g. 1.5)"""
+    for defs in (os.path.join(folder, 'Defs'), os.path.join(folder, version, 'Defs'),):
+        for directory, subdirectories, names in os.walk(defs):
+            subdirectories.sort()
+            for name in sorted(names):
+                if name.lower().endswith('.xml'):
+                    yield os.path.join(directory, name)
+
+def inherited(node, path, named):
+    """ Text at path in a def or the first of its parents that has it """
+    for _ in range(MAX_INHERITANCE):
+        if node is None:
+            return None
+        text = node.findtext(path)
+        if text and text.strip():
+            return text.strip()
+        node = named.get(node.get('ParentName'))
+    return None
+
+def part_names(core, labels):
+    """ Names of a body's parts in the order hediffs index them, which is depth first from the core part """
+    names = []
+    def visit(part, limb):
+        part_def = (part.findtext('def') or '').strip()
+        label = (part.findtext('customLabel') or labels.get(part_def) or part_def).strip().title()
+        names.append(f"{limb} Part" if limb else label)
+        if limb is None and part_def in LIMB_DEFS:
+            limb = label
+        for child in part.iterfind('parts/li'):
+            visit(child, limb)
+    visit(core, None)
+    return tuple(names)
+
+def compile_bodies(key, files):
+    """ Bodies from the BodyPartDefs, BodyDefs and race ThingDefs in the files. Later defs
+    of the same name replace earlier ones, as they do in the game """
+    from lxml import etree
+    parser = etree.XMLParser(remove_comments=True, recover=True)
+    labels = {}
+    cores = {}
+    things = {}
+    named = {}
+    for path in files:
+        try:
+            root = etree.parse(path, parser).getroot()
+        except (OSError, etree.XMLSyntaxError):
+            continue
+        if root is None:
+            continue
+        for node in root:
+            if not isinstance(node.tag, str):
+                continue
+            def_name = (node.findtext('defName') or '').strip()
+            if node.tag == 'BodyPartDef' and def_name:
+                labels[def_name] = (node.findtext('label') or def_name).strip()
+            elif node.tag == 'BodyDef' and def_name and node.find('corePart') is not None:
+                cores[def_name] = node.find('corePart')
+            elif node.tag == 'ThingDef' or node.tag.endswith('ThingDef_AlienRace'):
+                # Alien races use their own def class, with the same race fields
+                if node.get('Name'):
+                    named[node.get('Name')] = node
+                if def_name:
+                    things[def_name] = node
+    races = {}
+    for def_name, node in things.items():
+        body = inherited(node, 'race/body', named)
+        if body:
+            races[def_name] = body
+    parts = {def_name: part_names(core, labels) for def_name, core in cores.items()}
+    return Bodies(key, parts, races)
+
+def load(mod_ids, version, game, mods=()):
+    """ Bodies for the mods in load order, compiled from their Defs the first time this list is seen"""
+    version = '.'.join((version or '').split()[0].split('.')[:2]) if version else ''
+    key = hashlib.blake2b('\n'.join([version] + list(mod_ids)).encode(), digest_size=8).hexdigest()
+    path = os.path.join(DEFS_CACHE, f"{key}.pickle")
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        pass
+    folders = mod_folders(game, mods)
+    files = [file for mod_id in mod_ids if mod_id in folders for file in def_files(folders[mod_id], version)]
+    bodies = compile_bodies(key, files)
+    os.makedirs(DEFS_CACHE, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        pickle.dump(bodies, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+    return bodies
+
+def for_save(path, config_path=CONFIG):
+    """ Bodies for the save's mods, or None when the game folder is not configured"""
+    config = ConfigParser()
+    config.read(config_path)
+    game = config.get('path', 'game', fallback=None)
+    if not game:
+        return None
+    mods = [folder for folder in config.get('path', 'mods', fallback='').split(os.pathsep) if folder]
+    header = headers.SaveHeader(path)
+    return load(header.mods or ['ludeon.rimworld'], header.version, game, mods)
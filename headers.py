@@ -0,0 +1,105 @@
+""" What a save is, read from its first bytes, for a directory of saves at once"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+
+import stream
+
+BLOCK_SIZE = 1 << 16
+# The header fields are all before the maps; stop looking this far in
+HEADER_LIMIT = 8 << 20
+SCAN_THREADS = 16
+TICKS_PER_DAY = 60000
+
+HEADER_PATTERNS = {
+    'version': re.compile(rb'<gameVersion>([^<]*)</gameVersion>'),
+    'ticks': re.compile(rb'<ticksGame>(\d+)</ticksGame>'),
+    'seed': re.compile(rb'<seedString>([^<]*)</seedString>'),
+    'colony': re.compile(rb'<def>Player(?:Colony|Tribe)</def>.{0,2000}?<name>([^<]*)</name>', re.DOTALL),
+    'mods': re.compile(rb'<modIds>(.*?)</modIds>', re.DOTALL),
+}
+MOD_ID_PATTERN = re.compile(r'<li>([^<]*)</li>')
+MAPS_START = b'<maps>'
+# Same kinds as parse.COLONIST_KINDS
+COLONIST_PATTERN = re.compile(rb'<kindDef>(?:Colonist|Tribesperson)</kindDef>')
+
+class SaveHeader:
+    """ What the header of one save says. Fields it does not have are None """
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.version = None
+        self.ticks = None
+        self.seed = None
+        self.colony = None
+        self.colonists = None
+        # Package ids of the mods in load order, lower case
+        self.mods = None
+        self.read_header()
+
+    def read_header(self):
+        data = bytearray()
+        missing = dict(HEADER_PATTERNS)
+        with stream.open_bytes(self.path) as f:
+            while missing and len(data) < HEADER_LIMIT:
+                block = f.read(BLOCK_SIZE)
+                if not block:
+                    break
+                # Back far enough that a field cut by the last block is matched whole
+                start = max(len(data) - 4096, 0)
+                data += block
+                for field, pattern in list(missing.items()):
+                    match = pattern.search(data, start)
+                    if match:
+                        setattr(self, field, match.group(1).decode('utf-8', 'replace'))
+                        del missing[field]
+                if data.find(MAPS_START, start) != -1:
+                    break
+        if self.ticks is not None:
+            self.ticks = int(self.ticks)
+        if self.mods is not None:
+            self.mods = [mod_id.strip().lower() for mod_id in MOD_ID_PATTERN.findall(self.mods)]
+
+    def count_colonists(self):
+        """ Colonists on the maps. Unlike the header this reads the whole save, though only in C """
+        with stream.save_buffer(self.path) as buffer:
+            start = buffer.find(MAPS_START)
+            self.colonists = len(COLONIST_PATTERN.findall(buffer, max(start, 0)))
+
+    @property
+    def days(self):
+        return self.ticks / TICKS_PER_DAY if self.ticks is not None else None
+
+    def suggested_name(self):
+        """ A config section name from the colony name, or from the file name without one """
+        name = self.colony or os.path.splitext(os.path.basename(self.path))[0]
+        return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_') or 'colony'
+
+    def describe(self):
+        parts = [self.colony or 'unknown colony']
+        if self.seed is not None:
+            parts.append(f"seed {self.seed}")
+        if self.days is not None:
+            parts.append(f"day {self.days:.0f}")
+        if self.colonists is not None:
+            parts.append(f"{self.colonists} colonists")
+        if self.version is not None:
+            parts.append(f"v{self.version.split()[0]}")
+        return ', '.join(parts)
+
+def scan(paths, colonists=(), threads=SCAN_THREADS):
+    """ SaveHeader for each path, read in a thread pool, by path. Colonists are only
+    counted for the paths in colonists. Saves that cannot be read are left out """
+    colonists = set(colonists)
+    def read(path):
+        try:
+            header = SaveHeader(path)
+            if path in colonists:
+                header.count_colonists()
+            return header
+        except (OSError, EOFError, ValueError):
+            return None
+    with ThreadPoolExecutor(threads) as executor:
+        return {header.path: header for header in executor.map(read, paths) if header is not None}
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+""" Append-only SQLite history of the colony, one snapshot per save read with --history"""
+from argparse import ArgumentParser
+import os
+import sqlite3
+import time
+
+HISTORY_DB = 'local/history.sqlite'
+TICKS_PER_DAY = 60000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    faction TEXT NOT NULL,
+    saved REAL NOT NULL,
+    ticks INTEGER,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    UNIQUE (faction, mtime_ns, size)
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (faction, saved);
+CREATE TABLE IF NOT EXISTS pawns (
+    snapshot INTEGER NOT NULL REFERENCES snapshots (id),
+    faction TEXT NOT NULL,
+    saved REAL NOT NULL,
+    pawn TEXT NOT NULL,
+    prisoner INTEGER NOT NULL,
+    mood REAL,
+    resistance REAL,
+    wounds INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pawns_by_pawn ON pawns (faction, pawn, saved);
+CREATE TABLE IF NOT EXISTS skills (
+    snapshot INTEGER NOT NULL REFERENCES snapshots (id),
+    faction TEXT NOT NULL,
+    saved REAL NOT NULL,
+    ticks INTEGER,
+    pawn TEXT NOT NULL,
+    skill TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    passion TEXT,
+    xp REAL NOT NULL,
+    pct REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS skills_by_skill ON skills (faction, skill, saved, pawn);
+CREATE TABLE IF NOT EXISTS injuries (
+    snapshot INTEGER NOT NULL REFERENCES snapshots (id),
+    faction TEXT NOT NULL,
+    saved REAL NOT NULL,
+    pawn TEXT NOT NULL,
+    injury TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS injuries_by_pawn ON injuries (faction, pawn, saved);
+CREATE TABLE IF NOT EXISTS inventory (
+    snapshot INTEGER NOT NULL REFERENCES snapshots (id),
+    faction TEXT NOT NULL,
+    saved REAL NOT NULL,
+    category TEXT NOT NULL,
+    item TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inventory_by_item ON inventory (faction, item, saved);
+CREATE TABLE IF NOT EXISTS bills (
+    snapshot INTEGER NOT NULL REFERENCES snapshots (id),
+    faction TEXT NOT NULL,
+    saved REAL NOT NULL,
+    recipe TEXT NOT NULL,
+    repeat_type TEXT,
+    count INTEGER,
+    suspended INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bills_by_recipe ON bills (faction, recipe, saved);
+CREATE TABLE IF NOT EXISTS crops (
+    snapshot INTEGER NOT NULL REFERENCES snapshots (id),
+    faction TEXT NOT NULL,
+    saved REAL NOT NULL,
+    crop TEXT NOT NULL,
+    basin INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    growth REAL NOT NULL,
+    best_growth REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS crops_by_crop ON crops (faction, crop, saved);
+'''
+
+def connect(path=HISTORY_DB):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.executescript(SCHEMA)
+    return connection
+
+def record(faction, path, model, db=HISTORY_DB):
+    """ Adds a snapshot of the model of the save at path, unless that save is already recorded.
+    Returns whether it was added"""
+    # Imported here as parse imports this module
+    from parse import SKILL_UPGRADE, inventory_counts, skill_xp
+    stat = os.stat(path)
+    saved = stat.st_mtime
+    connection = connect(db)
+    try:
+        with connection:
+            try:
+                cursor = connection.execute(
+                    'INSERT INTO snapshots (faction, saved, ticks, path, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?)',
+                    (faction, saved, model.ticks, os.path.abspath(path), stat.st_size, stat.st_mtime_ns,))
+            except sqlite3.IntegrityError:
+                return False
+            head = (cursor.lastrowid, faction, saved,)
+            pawns = [(pawn, False,) for pawn in model.colonists] + [(pawn, True,) for pawn in model.prisoners]
+            connection.executemany('INSERT INTO pawns VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+                head + (pawn.name, prisoner, pawn.mood, pawn.resistance if pawn.resistance > -1 else None, pawn.injury_count,)
+                for pawn, prisoner in pawns))
+            connection.executemany('INSERT INTO skills VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                head + (model.ticks, pawn.name, skill, int(level), passion or None, skill_xp(level, xp), xp / SKILL_UPGRADE[int(level)],)
+                for pawn in model.colonists for skill, (level, passion, xp) in pawn.raw_skills.items()))
+            connection.executemany('INSERT INTO injuries VALUES (?, ?, ?, ?, ?)', (
+                head + (pawn.name, injury.strip(),)
+                for pawn, _ in pawns for injury in pawn.injuries))
+            connection.executemany('INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?)', (
+                head + (category, item, count,)
+                for (category, item,), count in inventory_counts(model).items()))
+            connection.executemany('INSERT INTO bills VALUES (?, ?, ?, ?, ?, ?, ?)', (
+                head + (bill.formatted_recipe, bill.repeat_type, getattr(bill, 'count', None), bill.suspended,)
+                for bill in model.bills))
+            table = model.plant_table
+            for basin, mask in ((False, table.sown & ~table.in_basin,), (True, table.sown & table.in_basin,),):
+                connection.executemany('INSERT INTO crops VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+                    head + (crop, basin, count, float(growth), float(best_growth),)
+                    for crop, (count, growth, best_growth,) in table.crops(mask).items()))
+        return True
+    finally:
+        connection.close()
+
+def since(connection, faction, last):
+    """ When the earliest of the last `last` snapshots of the faction was saved """
+    row = connection.execute(
+        'SELECT MIN(saved) FROM (SELECT saved FROM snapshots WHERE faction = ? ORDER BY saved DESC LIMIT ?)',
+        (faction, last,)).fetchone()
+    return row[0] if row[0] is not None else float('inf')
+
+def item_history(connection, faction, item, last=50):
+    """ (saved, count) of an item, by its name with any stuff, over the last snapshots """
+    return connection.execute(
+        'SELECT saved, SUM(count) FROM inventory WHERE faction = ? AND item = ? AND saved >= ? GROUP BY saved ORDER BY saved',
+        (faction, item, since(connection, faction, last),)).fetchall()
+
+def skill_rates(connection, faction, skill, last=50):
+    """ (pawn, level, xp gained, xp per game day) for a skill over the last snapshots """
+    return connection.execute('''
+        SELECT pawn, MAX(level), MAX(xp) - MIN(xp),
+            (MAX(xp) - MIN(xp)) * ? / NULLIF(MAX(ticks) - MIN(ticks), 0)
+        FROM skills WHERE faction = ? AND skill = ? AND saved >= ?
+        GROUP BY pawn ORDER BY pawn''',
+        (TICKS_PER_DAY, faction, skill, since(connection, faction, last),)).fetchall()
+
+def run(args):
+    connection = connect(args.db)
+    if args.query == 'snapshots':
+        for saved, ticks, path in connection.execute(
+                'SELECT saved, ticks, path FROM snapshots WHERE faction = ? ORDER BY saved DESC LIMIT ?', (args.faction, args.last,)):
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(saved))} {ticks or '':>10} {path}")
+    elif args.query == 'item':
+        for saved, count in item_history(connection, args.faction, args.name, args.last):
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(saved))} {count:6}")
+    elif args.query == 'skill':
+        for pawn, level, gained, rate in skill_rates(connection, args.faction, args.name, args.last):
+            per_day = f"{rate:8.0f}/day" if rate is not None else ''
+            print(f"{pawn:15} {level:3} {gained:+8.0f} {per_day}")
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("faction", help="name of faction")
+    parser.add_argument("query", choices=('snapshots', 'item', 'skill',))
+    parser.add_argument("name", nargs='?', help="item (e.g. Steel) or skill (e.g. Shooting)")
+    parser.add_argument("--last", help="how many of the latest snapshots", type=int, default=50)
+    parser.add_argument("--db", default=HISTORY_DB)
+    args = parser.parse_args()
+    if args.query != 'snapshots' and not args.name:
+        parser.error(f"{args.query} needs a name")
+    run(args)
@@ -0,0 +1,92 @@
+""" The map's compressed grids as NumPy arrays, and the rooms its walls and rock divide it into"""
+import base64
+import zlib
+
+import numpy
+
+# (x, z) of a map whose save does not give its size
+MAP_SIZE = (250, 250,)
+
+def decode(text, size, deflated=True):
+    """ A grid of ushorts, one per cell, as saved in base64 (deflated in the ...Deflate fields).
+    Returned indexed [z, x], as RimWorld lays cells out by row """
+    data = base64.b64decode(text)
+    if deflated:
+        data = zlib.decompress(data, -zlib.MAX_WBITS)
+    width, height = size
+    return numpy.frombuffer(data, '<u2').reshape(height, width)
+
+def label(open_cells):
+    """ Labels the 4-connected components of the True cells 1, 2, ... in row order, and the rest 0.
+    Each pass takes the least flat index among a cell's neighbours and then follows labels to
+    their own labels, so long corridors take a few passes rather than one per cell """
+    size = open_cells.size
+    indices = numpy.arange(size).reshape(open_cells.shape)
+    labels = numpy.where(open_cells, indices, size)
+    while True:
+        least = labels.copy()
+        numpy.minimum(least[1:], labels[:-1], out=least[1:])
+        numpy.minimum(least[:-1], labels[1:], out=least[:-1])
+        numpy.minimum(least[:, 1:], labels[:, :-1], out=least[:, 1:])
+        numpy.minimum(least[:, :-1], labels[:, 1:], out=least[:, :-1])
+        least[~open_cells] = size
+        flat = least.reshape(-1)
+        cells = flat < size
+        for _ in range(4):
+            flat[cells] = flat[flat[cells]]
+        if numpy.array_equal(least, labels):
+            break
+        labels = least
+    _, inverse = numpy.unique(labels, return_inverse=True)
+    inverse = inverse.reshape(open_cells.shape) + 1
+    inverse[~open_cells] = 0
+    return inverse.astype(numpy.int32)
+
+class Rooms:
+    """ Which room each cell of the map is in. Walls and rock divide rooms and doors do not,
+    so a room is the cells that can reach each other, and rooms that reach the map edge are outside.
+    Cells off the map and in walls are in room 0 """
+    def __init__(self, size, blocked, roofed, stockpiles):
+        self.size = size
+        self.labels = label(~blocked)
+        edges = numpy.concatenate((self.labels[0], self.labels[-1], self.labels[:, 0], self.labels[:, -1],))
+        self.outside = numpy.zeros(self.labels.max() + 1, bool)
+        self.outside[edges] = True
+        self.roofed = roofed
+        self.stockpiles = stockpiles
+        self.sealed = numpy.zeros(len(self.outside), bool)
+
+    @classmethod
+    def from_map(cls, size, rock, roofs, walls, stockpile_cells):
+        """ Rooms of a map from its decoded rock and roof grids (either may be None),
+        and the (x, z) of its walls and stockpile cells """
+        width, height = size = size or MAP_SIZE
+        blocked = numpy.zeros((height, width,), bool) if rock is None else rock != 0
+        for x, z in walls:
+            if 0 <= x < width and 0 <= z < height:
+                blocked[z, x] = True
+        stockpiles = numpy.zeros((height, width,), bool)
+        for x, z in stockpile_cells:
+            if 0 <= x < width and 0 <= z < height:
+                stockpiles[z, x] = True
+        return cls(size, blocked, None if roofs is None else roofs != 0, stockpiles)
+
+    def cells(self, positions):
+        """ Rooms of the (x, z) positions, 0 for those off the map """
+        return self.lookup(self.labels, positions, 0)
+
+    def seal(self, positions):
+        """ Marks the enclosed rooms holding any of the positions as sealed """
+        rooms = self.cells(positions)
+        rooms = rooms[(rooms != 0) & ~self.outside[rooms]]
+        self.sealed[rooms] = True
+
+    def lookup(self, grid, positions, default=False):
+        """ The grid's values at the (x, z) positions, default off the map """
+        positions = numpy.asarray(positions, numpy.int64).reshape(-1, 2)
+        xs, zs = positions[:, 0], positions[:, 1]
+        width, height = self.size
+        on_map = (xs >= 0) & (xs < width) & (zs >= 0) & (zs < height)
+        values = numpy.full(len(positions), default, grid.dtype)
+        values[on_map] = grid[zs[on_map], xs[on_map]]
+        return values
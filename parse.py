@@ -1,22 +1,35 @@
 #!/usr/bin/env python3
 """ Spit out info from rws file"""
+# Modules only some commands need (numpy, lxml, process pools, cProfile, inotify, the history,
+# defs and map grids) are imported where they are used, so --help and a cached report start quickly
 from argparse import ArgumentParser
 from configparser import ConfigParser
 from collections import Counter, defaultdict
-import csv
+from contextlib import contextmanager, redirect_stdout
+import io
 import math
 import os
+import pickle
 import re
-import statistics
+import sys
+import time
 
-from bs4 import BeautifulSoup
+import cache
+import classify
+from config import CONFIG, Options, factions
+import render
+import stream
+import timing
 
-CONFIG = 'local/parse.cnf'
 BUFFER_WIDTH = 12
 POSITION_PATTERN = re.compile(r'\((.*), (.*), (.*)\)')
 SKILLS = ['Shooting', 'Melee', 'Construction', 'Mining', 'Cooking', 'Plants', 'Animals', 'Crafting', 'Artistic', 'Medicine', 'Social', 'Intellectual']
 
 COLONIST_FACTIONS = ('Faction_10', 'Faction_21',)
+COLONIST_KINDS = ('Colonist', 'Tribesperson',)
+ITEM_CLASSES = ('ThingWithComps', 'Medicine', 'Apparel', 'UnfinishedThing',)
+WATCH_REPORTS = ['inventory', 'queue', 'injury',]
+ACTIONS = ['equipment', 'dead', 'skills', 'inventory', 'animals', 'harvest', 'wildlife', 'quests', 'queue', 'injury', 'top', 'where', 'test',]
 
 SKILL_UPGRADE = {
     0: 1000,
@@ -42,50 +55,46 @@ SKILL_UPGRADE = {
     20: 32000,
 }
 
-def body_part(body_part_num):
+def part_table(names, size=64):
+    """ Part names by index from (indices, name) pairs """
+    table = [None] * size
+    for indices, name in names:
+        for index in indices:
+            table[index] = name
+    return tuple(table)
+
+# The human body's parts by hediff part index, for when the game's Defs are not configured.
+# Parts below an arm or leg are named after it, as "Left Arm Part"
+HUMAN_PARTS = part_table((
+    (range(0, 3 + 1), 'Torso',),
+    ((4,), 'Spine',),
+    ((5,), 'Stomach',),
+    ((6,), 'Heart',),
+    ((7,), 'Left Lung',),
+    ((8,), 'Right Lung',),
+    ((11,), 'Liver',),
+    ((15,), 'Brain?',),
+    ((16,), 'Left Eye',),
+    ((17,), 'Right Eye',),
+    ((18,), 'Left Ear',),
+    ((19,), 'Right Ear',),
+    ((20,), 'Nose',),
+    ((23,), 'Left Arm',),
+    (range(24, 33 + 1), 'Left Arm Part',),
+    (range(34, 44 + 1), 'Right arm',),
+    ((46,), 'Left Leg',),
+    (range(47, 52 + 1), 'Left Leg Part',),
+    ((55,), 'Right Leg',),
+    (range(56, 63 + 1), 'Right Leg Part',),
+))
+
+def body_part(body_part_num, parts=HUMAN_PARTS):
+    """ Name of the part at a hediff's part index in a body's table """
     if not body_part_num:
         return 'General'
     num = int(body_part_num)
-    if num in range(0, 3 + 1):
-        return 'Torso'
-    elif num  == 4:
-        return 'Spine'
-    elif num  == 5:
-        return 'Stomach'
-    elif num  == 6:
-        return 'Heart'
-    elif num == 7:
-        return 'Left Lung'
-    elif num == 8:
-        return 'Right Lung'
-    elif num == 11:
-        return 'Liver'
-    elif num == 15:
-        return 'Brain?'
-    elif num == 16:
-        return 'Left Eye'
-    elif num == 17:
-        return 'Right Eye'
-    elif num == 18:
-        return 'Left Ear'
-    elif num == 19:
-        return 'Right Ear'
-    elif num == 20:
-        return 'Nose'
-    elif num == 23:
-        return 'Left Arm'
-    elif num in range(24, 33 + 1):
-        return 'Left Arm Part'
-    elif num in range(34, 44 + 1):
-        return 'Right arm'
-    elif num == 46:
-        return 'Left Leg'
-    elif num in range(47, 52 + 1):
-        return 'Left Leg Part'
-    elif num == 55:
-        return 'Right Leg'
-    elif num in range(56, 63 + 1):
-        return 'Right Leg Part'
+    if 0 <= num < len(parts) and parts[num]:
+        return parts[num]
     return body_part_num
 
 APPAREL_LOCATION = (
@@ -125,34 +134,30 @@ def classname(node):
             return v
     return []
 
-def location(thing):
-    """ Which cardinal location an object is in"""
-    x, y = position(thing)
-    if x < 83:
-        if y < 83:
-            return 'SW'
-        elif y < 167:
-            return 'W'
-        else:
-            return 'NW'
-    if x < 167:
-        if y < 83:
-            return 'S'
-        elif y < 167:
-            return 'C'
-        else:
-            return 'N'
-    else:
-        if y < 83:
-            return 'SE'
-        elif y < 167:
-            return 'E'
-        else:
-            return 'NE'
+# By thirds of the map, west to east then south to north
+LOCATION_BOUNDS = (83, 167,)
+LOCATIONS = (
+    ('SW', 'W', 'NW',),
+    ('S', 'C', 'N',),
+    ('SE', 'E', 'NE',),
+)
+
+def location(x, y):
+    """ Which cardinal location a point is in"""
+    return LOCATIONS[(x >= 83) + (x >= 167)][(y >= 83) + (y >= 167)]
+
+def regions(xs, ys):
+    """ Index into the flattened LOCATIONS of each point """
+    import numpy
+    return 3 * numpy.searchsorted(LOCATION_BOUNDS, xs, side='right') + numpy.searchsorted(LOCATION_BOUNDS, ys, side='right')
 
 def position(thing):
     """ Returns x,y coordinates of object """
-    x, _, y = POSITION_PATTERN.match(attribute(thing, 'pos')).groups()
+    return coordinates(attribute(thing, 'pos'))
+
+def coordinates(pos):
+    """ x,y of a pos field """
+    x, _, y = POSITION_PATTERN.match(pos).groups()
     return int(x), int(y)
 
 def attribute(node, tags, default=''):
@@ -167,43 +172,392 @@ def attribute(node, tags, default=''):
             return default
     return current_node and current_node.text or default
 
-def all_animals(soup):
-    """ Animals owned by colonists."""
-    owned_animals = []
-    def add_animal(thing):
-        if attribute(thing, 'def') != 'Human' and attribute(thing, 'faction') and attribute(thing,'mindstate'):
-            owned_animals.append(attribute(thing, 'def'))
-    for alivepawns in soup.find_all('pawnsalive'):
-        for li in alivepawns.findChildren('li', recursive=False):
-            add_animal(li)
-    for thing in soup.find_all('thing'):
-        add_animal(thing)
-    return owned_animals
-
-def animals(soup):
+class SaveIndex:
+    """ Buckets the records of a save in a single traversal. Each record is turned into what the model keeps
+    of it as it is read, so no record's elements outlive it and memory grows with what is kept, not the save"""
+    THING_FIELDS = stream.Fields('def', 'growth', 'sown', 'kinddef',)
+    # The mind state's text is all of its descendants', as attribute() reads it
+    PAWN_FIELDS = stream.Fields('def', 'faction', 'kinddef', ('mindstate',), ('guest', 'gueststatus',),)
+
+    def __init__(self, records, bodies=None, map_index=-1):
+        self.bodies = bodies
+        # Index of the map the records are in, counted by their mapinfo from the first map at 0.
+        # A chunk of a things list is given its map's
+        self.map_index = map_index
+        self.colonists = []
+        self.prisoners = []
+        self.dead = []
+        # Defs of the non-human pawns of factions, of the world then the maps, and of those of no faction on the maps
+        self.world_animals = []
+        self.animals = []
+        self.wildlife = []
+        # (Thing, whether it lies where it is) of the items on the maps, including minified furniture
+        self.candidates = []
+        self.plants = []
+        self.geysers = []
+        self.basins = []
+        self.bills = []
+        self.quests = []
+        self.designations = Counter()
+        self.ticks = None
+        # By map index
+        self.map_sizes = {}
+        self.rock = {}
+        self.roofs = {}
+        self.caskets = defaultdict(list)
+        self.walls = defaultdict(list)
+        self.stockpile_cells = defaultdict(list)
+        for record in records:
+            node = stream.Node(record)
+            if node.name == 'thing':
+                self.add_thing(node)
+            elif node.name == 'pawnsalive':
+                for li in node.find_all('li', recursive=False):
+                    self.add_pawn(li, self.world_animals)
+            elif node.name == 'pawnsdead':
+                self.dead.extend(Pawn(li, bodies) for li in node.find_all('li', recursive=False) if attribute(li, 'def') == 'Human')
+            elif node.name == 'quests':
+                for li in node.find_all('li', recursive=False):
+                    fields = SaveModel.QUEST_FIELDS(li)
+                    if 'cleanedup' not in fields:
+                        self.quests.append((fields.get('name', ''), fields.get('description', ''),))
+            elif node.name == 'alldesignations':
+                self.designations.update(attribute(li, 'def') for li in node.find_all('li', recursive=False))
+            elif node.name == 'ticksgame' and self.ticks is None:
+                self.ticks = int(node.text)
+            elif node.name == 'mapinfo':
+                self.map_index += 1
+                self.map_sizes[self.map_index] = coordinates(attribute(node, 'size'))
+            elif node.name == 'compressedthingmapdeflate':
+                self.rock.setdefault(self.current_map, node.text)
+            elif node.name == 'roofsdeflate':
+                self.roofs.setdefault(self.current_map, node.text)
+            elif node.name == 'zonemanager' and node.allzones:
+                for zone in node.allzones.find_all('li', recursive=False):
+                    if classname(zone)[0] == 'Zone_Stockpile' and zone.cells:
+                        self.stockpile_cells[self.current_map].extend(coordinates(li.text) for li in zone.cells.find_all('li', recursive=False))
+
+    @property
+    def current_map(self):
+        """ The map the records are in; saves without a mapinfo have only map 0 """
+        return max(self.map_index, 0)
+
+    def add_thing(self, thing):
+        fields = SaveIndex.THING_FIELDS(thing)
+        try:
+            thing_class = classname(thing)[0]
+        except IndexError:
+            thing_class = ''
+        thing_def = fields.get('def', '')
+        if thing_class in ITEM_CLASSES:
+            self.add_item(Thing(thing), True)
+        elif 'MinifiedThing' in thing_class:
+            self.add_item(Thing(thing.innercontainer.innerlist.li), False)
+        elif thing_class == 'Building_AncientCryptosleepCasket':
+            try:
+                if thing.innercontainer.innerlist.li:
+                    self.caskets[self.current_map].append(position(thing))
+            except AttributeError:
+                pass
+        if thing_def.endswith('Wall'):
+            self.walls[self.current_map].append(position(thing))
+        elif thing_def == 'SteamGeyser':
+            self.geysers.append(position(thing))
+        elif thing_def == 'HydroponicsBasin':
+            self.basins.append(Basin(thing))
+        if 'growth' in fields or 'sown' in fields:
+            self.plants.append(Plant(thing))
+        for stack in thing.find_all('billstack', recursive=False):
+            for bills in stack.find_all('bills', recursive=False):
+                self.bills.extend(Bill(li) for li in bills.find_all('li', recursive=False))
+        if 'kinddef' in fields:
+            self.add_pawn(thing, self.animals)
+
+    def add_item(self, thing, placed):
+        thing.map = self.current_map
+        self.candidates.append((thing, placed,))
+
+    def add_pawn(self, pawn, animals):
+        """ Keeps a colonist or prisoner, or the def of an animal, adding those of a faction to animals """
+        fields = SaveIndex.PAWN_FIELDS(pawn)
+        if fields.get('faction') in COLONIST_FACTIONS and fields.get('kinddef') in COLONIST_KINDS:
+            self.colonists.append(Pawn(pawn, self.bodies, counts_gear=True))
+        if fields.get(('guest', 'gueststatus',)) == 'Prisoner':
+            self.prisoners.append(Pawn(pawn, self.bodies))
+        if fields.get('def', '') != 'Human' and ('mindstate',) in fields:
+            if 'faction' in fields:
+                animals.append(sys.intern(fields['def']))
+            elif animals is self.animals:
+                self.wildlife.append(sys.intern(fields['def']))
+
+class SaveModel:
+    """ Everything the reports read, taken from a SaveIndex.
+    Holds no references to the parsed document, so it can be cached.
+    Models of consecutive parts of one save can be merged before finish()."""
+    VERSION = 15
+    LISTS = ('colonists', 'prisoners', 'dead', 'animals', 'wildlife', 'candidates', 'plants', 'geysers', 'basins', 'bills', 'quests',)
+    # Taken from the first part that has them
+    FIELDS = ('ticks',)
+    # By map index, each map's taken from the first part that has it
+    MAP_FIELDS = ('map_sizes', 'rock', 'roofs',)
+    # By map index, each map's extended by every part
+    MAP_LISTS = ('caskets', 'walls', 'stockpile_cells',)
+    QUEST_FIELDS = stream.Fields('cleanedup', 'name', 'description',)
+    # Pickled separately and only unpickled when a report uses them: the rooms and plant table hold
+    # numpy arrays, and the things are most of the model. The things are pickled as columns, which load several times faster
+    LAZY = ('rooms', 'plant_table', 'things',)
+
+    def __init__(self, index):
+        import mapgrids
+        # Most hit points seen by item kind, standing in for their maximums. Colonists' gear is added when decoded
+        self.maxes = {}
+        self.hit_points = None
+        self.colonists = index.colonists
+        self.prisoners = index.prisoners
+        self.dead = index.dead
+        self.animals = index.world_animals + index.animals
+        self.wildlife = index.wildlife
+        self.candidates = index.candidates
+        for thing, _ in self.candidates:
+            thing.record_health(self.maxes)
+        self.caskets = index.caskets
+        self.walls = index.walls
+        self.stockpile_cells = index.stockpile_cells
+        self.map_sizes = index.map_sizes
+        self.rock = {map_index: mapgrids.decode(text, self.map_sizes.get(map_index) or mapgrids.MAP_SIZE) for map_index, text in index.rock.items()}
+        self.roofs = {map_index: mapgrids.decode(text, self.map_sizes.get(map_index) or mapgrids.MAP_SIZE) for map_index, text in index.roofs.items()}
+        # Map index: its Rooms, found when the model is finished
+        self.rooms = {}
+        self.things = []
+        self.plant_table = None
+        self.plants = index.plants
+        self.geysers = index.geysers
+        self.basins = index.basins
+        self.bills = index.bills
+        self.designations = index.designations
+        self.quests = index.quests
+        self.ticks = index.ticks
+
+    @classmethod
+    def combine(cls, parts):
+        """ New unfinished model made of the parts of one save, in order """
+        model = cls.__new__(cls)
+        for name in cls.LISTS:
+            setattr(model, name, [])
+        model.things = []
+        model.plant_table = None
+        model.designations = Counter()
+        model.maxes = {}
+        model.hit_points = None
+        for name in cls.FIELDS:
+            setattr(model, name, None)
+        for name in cls.MAP_FIELDS:
+            setattr(model, name, {})
+        for name in cls.MAP_LISTS:
+            setattr(model, name, defaultdict(list))
+        model.rooms = {}
+        for part in parts:
+            model.merge(part)
+        return model
+
+    def merge(self, other):
+        """ Appends the model of the part of the save that follows this one """
+        for name in SaveModel.LISTS:
+            getattr(self, name).extend(getattr(other, name))
+        self.designations.update(other.designations)
+        for key, value in other.maxes.items():
+            self.maxes[key] = max(value, self.maxes.get(key, 0))
+        for name in SaveModel.FIELDS:
+            if getattr(self, name) is None:
+                setattr(self, name, getattr(other, name))
+        for name in SaveModel.MAP_FIELDS:
+            for map_index, value in getattr(other, name).items():
+                getattr(self, name).setdefault(map_index, value)
+        for name in SaveModel.MAP_LISTS:
+            for map_index, values in getattr(other, name).items():
+                getattr(self, name)[map_index].extend(values)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        pickled = dict(state.pop('_pickled', {}))
+        for name in SaveModel.LAZY:
+            if name in state:
+                value = state.pop(name)
+                if name == 'things':
+                    value = Thing.columns(value)
+                pickled[name] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        state['_pickled'] = pickled
+        return state
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, such as those of an unpickled model that are not used yet
+        pickled = self.__dict__.get('_pickled')
+        if pickled and name in pickled:
+            value = pickle.loads(pickled.pop(name))
+            if name == 'things':
+                value = Thing.from_columns(value, self.hit_points)
+            setattr(self, name, value)
+            return value
+        raise AttributeError(name)
+
+    def undecoded(self):
+        """ How many parts of pawns are still xml """
+        return sum(len(pawn.xml) for pawn in self.colonists + self.prisoners + self.dead)
+
+    def finish(self):
+        """ Finds each map's rooms, drops the loose things in sealed rooms with occupied caskets, puts the plants in a table
+        and gives the things and pawns the save's hit points """
+        import mapgrids
+        on_map = defaultdict(list)
+        for thing, placed in self.candidates:
+            on_map[thing.map].append(thing)
+        sealed = {}
+        for map_index in sorted(set(self.map_sizes) | set(on_map)):
+            rooms = mapgrids.Rooms.from_map(self.map_sizes.get(map_index), self.rock.get(map_index), self.roofs.get(map_index),
+                self.walls.get(map_index, ()), self.stockpile_cells.get(map_index, ()))
+            rooms.seal(self.caskets.get(map_index, ()))
+            self.rooms[map_index] = rooms
+            things = on_map[map_index]
+            sealed.update(zip(things, rooms.sealed[rooms.cells([thing.position for thing in things])]))
+        self.things = [thing for thing, placed in self.candidates if not (placed and sealed[thing])]
+        self.candidates = []
+        self.walls = {}
+        self.stockpile_cells = {}
+        self.rock = {}
+        self.roofs = {}
+        self.plant_table = PlantTable(self.plants, self.basins)
+        self.plants = []
+        pawns = self.colonists + self.prisoners + self.dead
+        self.hit_points = HitPoints(self.maxes, self.colonists)
+        for pawn in pawns:
+            pawn.use_hit_points(self.hit_points)
+        for thing in self.things:
+            thing.hit_points = self.hit_points
+
+def extract_chunk(path, start, end, bodies=None, map_index=0):
+    """ Model of a byte range of the things list of a map and the CPU seconds it took """
+    started = time.process_time()
+    with stream.save_buffer(path) as buffer:
+        model = extract_model(stream.RangeReader(buffer, [(start, end,)], b'<things>', b'</things>'), bodies, map_index)
+    return model, time.process_time() - started
+
+def parallel_model(path, jobs, bodies=None):
+    """ Parses the map things lists in chunks across jobs processes while
+    this process parses the rest of the save """
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    from concurrent.futures import ProcessPoolExecutor
+    with stream.save_buffer(path) as buffer:
+        outside, chunks = stream.split_things(buffer, 4*jobs)
+        maps = stream.map_indices(buffer, [start for start, _ in chunks])
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = [executor.submit(extract_chunk, path, start, end, bodies, map_index) for (start, end,), map_index in zip(chunks, maps)]
+            model = extract_model(stream.RangeReader(buffer, outside), bodies)
+            work = 0
+            for future in futures:
+                part, elapsed = future.result()
+                model.merge(part)
+                work += elapsed
+    model.finish()
+    wall = time.perf_counter() - started
+    # Not a speedup over the serial path, which is not run: the CPU kept busy on average, and the share of
+    # it in this process (the rest of the save, unpickling the chunks' models and finish()), which no worker can take
+    own = time.process_time() - cpu_started
+    work += own
+    print(f"Parsed {len(chunks)} chunks on {jobs} workers in {wall:.2f}s ({work:.2f}s of CPU, {work/wall:.1f} CPUs busy, {own:.2f}s in this process)", file=sys.stderr)
+    return model
+
+def chunked_model(path, parts=None, bodies=None):
+    """ Model of the save put together from a model per section. Sections whose
+    bytes match one of the given parts are not extracted again.
+    Returns the model and its parts by section digest """
+    import hashlib
+    parts = parts or {}
+    current = {}
+    with stream.save_buffer(path) as buffer, memoryview(buffer) as view:
+        outside, chunks = stream.content_chunks(buffer)
+        maps = stream.map_indices(buffer, [start for start, _ in chunks])
+        for ranges, map_index in [(outside, None,)] + [([chunk], map_index,) for chunk, map_index in zip(chunks, maps)]:
+            digest = hashlib.blake2b(digest_size=16)
+            for start, end in ranges:
+                digest.update(view[start:end])
+            # The same things on another map are another part
+            digest.update(str(map_index).encode())
+            key = digest.digest()
+            if key in parts or key in current:
+                current[key] = parts.get(key) or current[key]
+                continue
+            if ranges is outside:
+                current[key] = extract_model(stream.RangeReader(buffer, outside), bodies)
+            else:
+                current[key] = extract_model(stream.RangeReader(buffer, ranges, b'<things>', b'</things>'), bodies, map_index)
+    model = SaveModel.combine(current.values())
+    model.finish()
+    return model, current
+
+def load_model(path, use_cache=True, jobs=None):
+    """ Extracted model for the save at path, from the cache when it is current"""
+    import defs
+    model = None
+    with timing.phase('defs'):
+        bodies = defs.for_save(path)
+    if use_cache:
+        with timing.phase('cache load'):
+            model = cache.load(path, model_version(bodies))
+    if model is None:
+        # Compressed saves are streamed through one decompressor rather than split across workers
+        if jobs and not stream.compression(path):
+            with timing.phase('parallel parse'):
+                model = parallel_model(path, jobs, bodies)
+        else:
+            with stream.open_save(path) as source:
+                model = extract_model(source, bodies)
+            with timing.phase('extract'):
+                model.finish()
+        if use_cache:
+            with timing.phase('cache store'):
+                cache.store(path, model_version(bodies), model)
+    return model
+
+def model_version(bodies):
+    """ Cache version of models whose pawns were read with the given body tables,
+    and whose items were sorted by the configured rules """
+    keys = tuple(key for key in (bodies and bodies.key, classify.get().key,) if key)
+    return (SaveModel.VERSION,) + keys if keys else SaveModel.VERSION
+
+def extract_model(source, bodies=None, map_index=-1):
+    """ Unfinished model of the save (or part of one, inside the map of the given index) read from source """
+    with timing.phase('index'):
+        index = SaveIndex(timing.timed(stream.iter_records(source), 'parse'), bodies, map_index)
+    with timing.phase('extract'):
+        return SaveModel(index)
+
+def animals_data(model):
     """ Animals owned by colonists."""
-    animal_ctr = Counter()
-    for animal in all_animals(soup):
-        animal_ctr[animal] += 1
-    for animal in sorted(animal_ctr):
-        print("{},{}".format(animal, animal_ctr[animal]))
+    return dict(sorted(Counter(model.animals).items()))
 
-def wildlife(soup):
+def wildlife_data(model):
     """ Animals not owned by colonists."""
-    animals = Counter()
-    def add_animal(thing):
-        if attribute(thing, 'def') != 'Human' and not attribute(thing, 'faction') and attribute(thing,'mindstate'):
-            animals[attribute(thing, 'def')] += 1
-    for thing in soup.find_all('thing'):
-        add_animal(thing)
-    for animal in sorted(animals):
-        print("{},{}".format(animal, animals[animal]))
+    return dict(sorted(Counter(model.wildlife).items()))
+
+def animals(data):
+    for animal, count in data.items():
+        print("{},{}".format(animal, count))
+
+def animal_rows(data):
+    return [{'animal': animal, 'count': count} for animal, count in data.items()]
 
 class MockThing:
+    __slots__ = ('name', 'base_name', 'max_key', 'hit_points',)
     def __init__(self):
         self.name = self.base_name = self.max_key = ''
+        self.hit_points = None
+
+NO_ITEM = MockThing()
 
 class Pawn:
+    """ A pawn's name and the parts of its xml the reports read. Its skills, health, mood and gear are
+    each decoded when first asked for and then kept, so a report only pays for what it reads """
     ITEM_CATEGORIES =  ('head',
             'skin-top',
             'skin-bottom',
@@ -214,22 +568,106 @@ class Pawn:
             'medicine',
         )
 
-    def __init__(self, thing, options):
-        self.name = attribute(thing, ('name', 'nick',)) or attribute( thing, ('name', 'first'))
-        self.changes = []
-        self.thing = thing
-        self.injuries = []
-        self.temporary_injuries = []
-        self.items = defaultdict(MockThing)
-        self.skills = defaultdict(dict)
+    FIELDS = stream.Fields('def', ('name', 'nick',), ('name', 'first',), ('guest', 'gueststatus',), ('guest', 'resistance',), ('needs', 'needs', 'li', 'curlevel',),)
+    MOOD_FIELDS = (('guest', 'gueststatus',), ('guest', 'resistance',), ('needs', 'needs', 'li', 'curlevel',),)
+    SKILL_FIELDS = stream.Fields('def', 'level', 'passion', 'xpsincelastlevel',)
+    HEDIFF_FIELDS = stream.Fields('def', 'ispermanent', 'severity', ('part', 'index',),)
+    # The subtrees each part of the pawn is decoded from
+    GEAR = ('apparel', 'equipment', 'inventory',)
+    __slots__ = ('name', 'parts', 'xml', 'mood_fields', 'hit_points', 'counts_gear', 'missing_body_part_nums', '_raw_skills', '_skills', '_changes', '_injuries', '_temporary_injuries', '_mood', '_resistance', '_items', '_gear_maxes',)
+
+    def __init__(self, thing, bodies=None, counts_gear=False):
+        fields = Pawn.FIELDS(thing)
+        self.name = fields.get(('name', 'nick',)) or fields.get(('name', 'first',), '')
+        self.parts = (bodies and bodies.of(fields.get('def'))) or HUMAN_PARTS
+        # The mood's fields come with the name's, so they are kept rather than their subtrees
+        self.mood_fields = {field: fields[field] for field in Pawn.MOOD_FIELDS if field in fields}
+        self.xml = {
+            'skills': stream.dump(thing.skills),
+            'health': tuple(stream.dump(tracker) for tracker in thing.find_all('healthtracker')),
+        }
+        for part in Pawn.GEAR:
+            self.xml[part] = stream.dump(getattr(thing, part))
+        # The model's, set when it is finished
+        self.hit_points = None
+        # Whether the gear's healths go toward the model's maximums
+        self.counts_gear = counts_gear
         self.missing_body_part_nums = set()
+        self._raw_skills = self._skills = self._changes = None
+        self._injuries = self._temporary_injuries = None
+        self._mood = self._resistance = None
+        self._items = self._gear_maxes = None
+
+    @property
+    def raw_skills(self):
+        if self._raw_skills is None:
+            self._raw_skills = {}
+            for skill in stream.undump(self.xml.pop('skills')).find_all('li'):
+                skill_fields = Pawn.SKILL_FIELDS(skill)
+                if 'def' in skill_fields:
+                    self._raw_skills[sys.intern(skill_fields['def'])] = (sys.intern(skill_fields.get('level', '0')), sys.intern(skill_fields.get('passion', '')), float(skill_fields.get('xpsincelastlevel', '0')),)
+        return self._raw_skills
+
+    @property
+    def skills(self):
+        if self._skills is None:
+            self.load_skills({})
+        return self._skills
+
+    @property
+    def changes(self):
+        if self._changes is None:
+            self.load_skills({})
+        return self._changes
+
+    @property
+    def injuries(self):
+        if self._injuries is None:
+            self.load_injuries()
+        return self._injuries
 
-        self.load_skills(thing, options)
-        self.load_injuries(thing)
-        self.load_mood(thing)
-        self.load_equipment(thing)
+    @property
+    def temporary_injuries(self):
+        if self._temporary_injuries is None:
+            self.load_injuries()
+        return self._temporary_injuries
+
+    @property
+    def mood(self):
+        if self._mood is None:
+            self.load_mood()
+        return self._mood
+
+    @property
+    def resistance(self):
+        if self._resistance is None:
+            self.load_mood()
+        return self._resistance
 
-    def load_skills(self, thing, options):
+    @property
+    def items(self):
+        if self._items is None:
+            self.load_equipment()
+            if self.hit_points and self.counts_gear:
+                self.hit_points.count(self._gear_maxes)
+        return self._items
+
+    @property
+    def gear_maxes(self):
+        """ Most hit points of each kind of item in the gear, or None before it is decoded """
+        return self._gear_maxes
+
+    def use_hit_points(self, hit_points):
+        """ Takes the hit points of the model it is in. A pawn of a part reused from an earlier model
+        may have decoded its gear already, with that model's """
+        self.hit_points = hit_points
+        for item in (self._items or {}).values():
+            item.hit_points = hit_points
+
+    def load_skills(self, options):
+        """ Skills as seen against the levels recorded in options, which are then updated"""
+        self._changes = []
+        self._skills = defaultdict(dict)
         track_changes = False
         olds = {}
         try:
@@ -239,32 +677,31 @@ class Pawn:
         except AttributeError:
             for skill in SKILLS:
                 olds[skill] = '0'
-        for skill in thing.skills.find_all('li'):
-            skillname =  attribute(skill, 'def')
-            if skillname:
-                if olds[skillname] == 'X':
-                    self.skills[skillname]['level'] = 'X'
-                    self.skills[skillname]['passion'] = None
-                    self.skills[skillname]['pct'] = 0
-                else:
-                    level = attribute(skill, 'level', '0')
-                    self.skills[skillname]['level'] = level
-                    self.skills[skillname]['passion'] = attribute(skill, 'passion')
-                    self.skills[skillname]['pct'] = float(attribute(skill, 'xpsincelastlevel', '0')) / SKILL_UPGRADE[int(level)]
-                    if track_changes:
-                        change = int(level) - int(olds[skillname])
-                        if change:
-                            self.changes.append('{:+} {} ({})'.format(change, skillname, level))
+        for skillname, (level, passion, xp) in self.raw_skills.items():
+            if olds[skillname] == 'X':
+                self.skills[skillname]['level'] = 'X'
+                self.skills[skillname]['passion'] = None
+                self.skills[skillname]['pct'] = 0
+            else:
+                self.skills[skillname]['level'] = level
+                self.skills[skillname]['passion'] = passion
+                self.skills[skillname]['pct'] = xp / SKILL_UPGRADE[int(level)]
+                if track_changes:
+                    change = int(level) - int(olds[skillname])
+                    if change:
+                        self.changes.append('{:+} {} ({})'.format(change, skillname, level))
         options[self.name] =  ','.join(self.skill_list[1:])
 
-    def load_injuries(self, thing):
+    def load_injuries(self):
+        self._injuries = []
+        self._temporary_injuries = []
         added_parts = {}
         implants = defaultdict(list)
         missing_parts = {}
         injured_parts = defaultdict(list)
         complications = defaultdict(list)
-        for tracker in thing.find_all('healthtracker'):
-            for issue in tracker.find_all('li'):
+        for tracker in self.xml.pop('health'):
+            for issue in stream.undump(tracker).find_all('li'):
                 try:
                     _class = classname(issue)[0]
                     if _class == 'HediffWithComps':
@@ -274,11 +711,12 @@ class Pawn:
                     issue_class = _class[7:]
                 except IndexError:
                     continue
-                issue_def = attribute(issue, 'def')
-                perm = attribute(issue, 'ispermanent')
-                part_number = attribute(issue, ('part', 'index',))
-                part = body_part(part_number)
-                severity = float(attribute(issue, 'severity', 0))
+                fields = Pawn.HEDIFF_FIELDS(issue)
+                issue_def = fields.get('def', '')
+                perm = fields.get('ispermanent', '')
+                part_number = fields.get(('part', 'index',), '')
+                part = body_part(part_number, self.parts)
+                severity = float(fields.get('severity', 0))
                 if issue_class == 'AddedPart':
                     added_parts[part] = issue_def
                 elif issue_class == 'Implant':
@@ -291,7 +729,7 @@ class Pawn:
                 elif issue_class == 'Injury' and perm == 'True':
                     injured_parts[part.replace(' Part', '')].append(severity)
                 elif issue_class == 'Injury':
-                    self.temporary_injuries.append((part, severity,))
+                    self._temporary_injuries.append((part, severity,))
                 elif issue_class in ('Addiction', 'Complication'):
                     complications[part].append(issue_def)
 
@@ -299,22 +737,25 @@ class Pawn:
         for part, addition in added_parts.items():
             # NOT CURRENTLY INTERESTED IN ENHANCEMENTS
             if 'Bionic' not in addition and 'Archotech' not in addition:
-                self.injuries.append(f" {part} has {addition}")
+                self._injuries.append(f" {part} has {addition}")
         # NOT CURRENTLY INTERESTED IN ENHANCEMENTS
         # for part, addition in implants.items():
-        #     self.injuries.append(f" {part} has {addition}")
+        #     self._injuries.append(f" {part} has {addition}")
         for part in missing_parts:
             if not part in added_parts:
-                self.injuries.append(f" {part} missing")
+                self._injuries.append(f" {part} missing")
         for part, injuries in injured_parts.items():
             if part not in added_parts and part not in missing_parts:
-                self.injuries.append(f" {part} permanently injured ({len(injuries):2} injuries, {max(injuries):.2} max)")
+                self._injuries.append(f" {part} permanently injured ({len(injuries):2} injuries, {max(injuries):.2} max)")
         for part, complication_list in complications.items():
             for complication in complication_list:
                 if part == 'General':
-                    self.injuries.append(f" {complication}")
+                    self._injuries.append(f" {complication}")
                 else:
-                    self.injuries.append(f" {complication} in {part}")
+                    self._injuries.append(f" {complication} in {part}")
+
+    def item(self, category):
+        return self.items.get(category, NO_ITEM)
 
     @property
     def injury_count(self):
@@ -324,33 +765,42 @@ class Pawn:
     def max_severity(self):
         return max([injury[1] for injury in self.temporary_injuries])
 
-    def load_mood(self, thing):
-        self.resistance = -1
-        self.mood = 0
-        if thing.guest.gueststatus and thing.guest.gueststatus.text == 'Prisoner':
-            self.resistance = float(thing.guest.resistance.text)
+    def load_mood(self):
+        fields = self.mood_fields
+        self._resistance = -1
+        self._mood = 0
+        if fields.get(('guest', 'gueststatus',)) == 'Prisoner':
+            self._resistance = float(fields[('guest', 'resistance',)])
         else:
             try:
-                self.mood = float(attribute(thing, ('needs', 'needs', 'li', 'curlevel',)))
+                self._mood = float(fields.get(('needs', 'needs', 'li', 'curlevel',), ''))
             except ValueError:
                 pass
 
-    def load_equipment(self, thing):
-        for li in thing.apparel.find_all('li'):
+    def load_equipment(self):
+        """ Decodes the gear, keeping the most hit points seen of each kind of it """
+        self._items = {}
+        self._gear_maxes = maxes = {}
+        gear = {part: stream.undump(self.xml.pop(part)) for part in Pawn.GEAR}
+        # Names are matched before the items have hit points, so without percentages
+        for li in gear['apparel'].find_all('li'):
             item = Thing(li)
+            item.record_health(maxes)
             for name, place in APPAREL_LOCATION:
                 if name in item.name:
-                    self.items[place] = item
+                    self._items[place] = item
                     break
-        for li in thing.equipment.find_all('li'):
+        for li in gear['equipment'].find_all('li'):
             item = Thing(li)
+            item.record_health(maxes)
             if item.name:
-                self.items['weapon'] = item
+                self._items['weapon'] = item
 
-        for li in thing.inventory.find_all('li'):
-            item_def = attribute(li, 'def', '')
+        for li in gear['inventory'].find_all('li'):
+            fields = Thing.FIELDS(li)
+            item_def = fields.get('def', '')
             if item_def.startswith('Medicine'):
-                count = attribute(li, 'stackcount')
+                count = fields.get('stackcount', '')
                 item = MockThing()
                 if item_def == 'MedicineHerbal':
                     item.name = f"Herbal Med:     {count}"
@@ -358,7 +808,9 @@ class Pawn:
                     item.name = f"Medicine:       {count}"
                 elif item_def == 'MedicineUltratech':
                     item.name = f"Glitter Med:    {count}"
-                self.items['medicine'] = item
+                self._items['medicine'] = item
+        for item in self._items.values():
+            item.hit_points = self.hit_points
 
     @property
     def armor_level(self):
@@ -389,17 +841,10 @@ class Pawn:
             _combat_info = '(Range - {})'.format(self.skills['Shooting']['level'])
         elif combat_role in ('MeleeWeapon',):
             _combat_info = '(Melee - {})'.format(self.skills['Melee']['level'])
-        elif not self.items['weapon']:
+        elif not self.item('weapon'):
             _combat_info = '** UNARMED **'
         return _combat_info
 
-    @property
-    def max_equipment_description(self):
-        max_length = 0
-        for item in self.items.values():
-            max_length = max(max_length, len(item.name))
-        return max_length
-
     @property
     def skill_list(self):
         l = [self.name, ]
@@ -414,40 +859,42 @@ class Pawn:
         else:
             return f"({self.injury_count:2} {self.max_severity: >4.1f})"
 
-def all_pawns(soup, options):
-    pawns = []
-    def add_pawn(thing):
-        if attribute(thing, 'kinddef') in ('Colonist', 'Tribesperson',) and attribute(thing, 'faction') in COLONIST_FACTIONS:
-            pawn = Pawn(thing, options)
-            pawns.append(pawn)
-    for alivepawns in soup.find_all('pawnsalive'):
-        for thing in alivepawns.findChildren('li', recursive=False):
-            add_pawn(thing)
-    for thing in soup.find_all('thing'):
-        add_pawn(thing)
-    return pawns
-
-def all_prisoners(soup):
-    pawns = []
-    def add_pawn(thing):
-        if attribute(thing, ('guest', 'gueststatus',)) == 'Prisoner':
-            pawn = Pawn(thing, {})
-            pawns.append(pawn)
-    for alivepawns in soup.find_all('pawnsalive'):
-        for thing in alivepawns.findChildren('li', recursive=False):
-            add_pawn(thing)
-    for thing in soup.find_all('thing'):
-        add_pawn(thing)
-    return pawns
-
-def all_dead(soup):
-    for pd in soup.find_all('pawnsdead'):
-        for li in pd.find_all('li'):
-            if attribute(li, 'def') == 'Human':
-                pawn = Pawn(li, {})
-                print(pawn.skill_list)
-
-def pawn_skills(soup, options):
+def all_pawns(model, options):
+    for pawn in model.colonists:
+        pawn.load_skills(options)
+    return model.colonists
+
+def pawn_data(pawn):
+    return {
+        'name': pawn.name,
+        'mood': pawn.mood,
+        'resistance': pawn.resistance if pawn.resistance > -1 else None,
+        'injury_count': pawn.injury_count,
+        'max_severity': pawn.injury_count and pawn.max_severity or None,
+        'skills': {skill: dict(pawn.skills[skill]) for skill in SKILLS if skill in pawn.skills},
+        'changes': pawn.changes,
+    }
+
+def pawns_data(model, options):
+    return {
+        'colonists': [pawn_data(pawn) for pawn in sorted(all_pawns(model, options), key=lambda x: x.name)],
+        'prisoners': [pawn_data(pawn) for pawn in sorted(all_prisoners(model), key=lambda x: x.name)],
+    }
+
+def all_prisoners(model):
+    return model.prisoners
+
+def dead_data(model):
+    return [pawn.skill_list for pawn in model.dead]
+
+def all_dead(data):
+    for skill_list in data:
+        print(skill_list)
+
+def dead_rows(data):
+    return [dict(zip(['name'] + SKILLS, skill_list)) for skill_list in data]
+
+def pawn_skills(data):
     def buffers(skill, buffer_width):
         length = len(skill)
         buffer_back = (buffer_width - length) // 2
@@ -463,30 +910,32 @@ def pawn_skills(soup, options):
         bf, bb = buffers(skill, buffer_width)
         return bf + '\033[92m\033[01m{}\033[00m'.format(skill) + bb
 
-    pawns = all_pawns(soup, options)
-    prisoners = all_prisoners(soup)
     changes = []
     fmt = '  {:32} {:^12} {:^12} {:^12} {:^12} {:^12} {:^12} {:^12} {:^12} {:^12} {:^12} {:^12} {:^12}\n'
     print(fmt.format('Pawn             mood  injured', *SKILLS))
     def print_pawn(pawn):
-        if pawn.resistance > -1:
-            name = "{:15} ({: >3.0f}) {}".format(pawn.name, pawn.resistance, pawn.health)
-        elif pawn.mood:
-            mood = f"{pawn.mood: >3.1f}"
-            if pawn.mood < .25:
+        if not pawn['injury_count']:
+            health = '         '
+        else:
+            health = f"({pawn['injury_count']:2} {pawn['max_severity']: >4.1f})"
+        if pawn['resistance'] is not None:
+            name = "{:15} ({: >3.0f}) {}".format(pawn['name'], pawn['resistance'], health)
+        elif pawn['mood']:
+            mood = f"{pawn['mood']: >3.1f}"
+            if pawn['mood'] < .25:
                 mood = format_major(mood, 0)
-            elif pawn.mood < .35:
+            elif pawn['mood'] < .35:
                 mood = format_minor(mood, 0)
             else:
                 mood = format_normal(mood, 0)
-            name = "{:15} ({}) {}".format(pawn.name, mood, pawn.health)
+            name = "{:15} ({}) {}".format(pawn['name'], mood, health)
         else:
-            name = pawn.name
+            name = pawn['name']
         items = [name,]
         for skill in SKILLS:
-            passion = pawn.skills[skill]['passion']
-            level = pawn.skills[skill]['level']
-            pct = pawn.skills[skill]['pct']
+            passion = pawn['skills'][skill]['passion']
+            level = pawn['skills'][skill]['level']
+            pct = pawn['skills'][skill]['pct']
             if pct < 0:
                 level += '(-)'
             elif pct > 0.1:
@@ -501,98 +950,105 @@ def pawn_skills(soup, options):
             else:
                 items.append('--')
         print(fmt.format(*items))
-    for pawn in sorted(pawns, key=lambda x: x.name):
-        if pawn.changes:
-            changes.append('{:15}: {}'.format(pawn.name, ', '.join(pawn.changes)))
+    for pawn in data['colonists']:
+        if pawn['changes']:
+            changes.append('{:15}: {}'.format(pawn['name'], ', '.join(pawn['changes'])))
         print_pawn(pawn)
-    if prisoners:
+    if data['prisoners']:
         print('PRISONERS')
-        for pawn in sorted(prisoners, key=lambda x: x.name):
+        for pawn in data['prisoners']:
             print_pawn(pawn)
     if changes:
         print('\nCHANGES:')
         for change in changes:
             print(change)
 
+def pawn_rows(data):
+    rows = []
+    for group in ('colonists', 'prisoners',):
+        for pawn in data[group]:
+            row = {'group': group}
+            row.update((key, pawn[key]) for key in ('name', 'mood', 'resistance', 'injury_count', 'max_severity',))
+            for skill in SKILLS:
+                row[skill] = pawn['skills'][skill]['level']
+                row[f"{skill} passion"] = pawn['skills'][skill]['passion']
+            rows.append(row)
+    return rows
+
 class Thing:
-    CATEGORIES = {
-        'Drugs': ('Ambrosia', 'Beer', 'SmokeleafJoint', 'Yayo',),
-        'Medicine': ('Neutroamine', 'Penoxycyline',),
-        'Ores' : ('Gold', 'Jade', 'Plasteel', 'Silver', 'Steel', 'Uranium',),
-        'Raw Food': ('Milk', 'Wort',),
-        'Wool': ('Cloth', 'DevilstrandCloth',),
-    }
-    QUALITY = ('Apparel', 'Gun', 'MeleeWeapon', 'Misc',)
-    TRUNCATE = ('Blocks', 'Grenade', 'Meal', 'Medicine', 'Unfinished', 'Wool',)
-    maxes = defaultdict(int)
+    FIELDS = stream.Fields('id', 'def', 'pos', 'health', 'biocoded', 'wornbycorpse', 'recipe', 'creatorname', 'stuff', 'quality', 'stackcount',)
+    __slots__ = ('id', 'category', 'base_name', 'stuff', 'quality', 'qualifications', 'health', 'hit_points', 'biocoded', 'tainted', 'map', 'position', 'count',)
+    # What a model's things are pickled as, one column each. Their hit points are the model's
+    COLUMNS = tuple(name for name in __slots__ if name != 'hit_points')
+
     def __init__(self, thing):
-        name = attribute(thing, 'def')
-        self.category = 'Misc'
+        fields = Thing.FIELDS(thing)
+        self.id = fields.get('id', '')
+        classifier = classify.get()
+        self.category, self.base_name, has_quality = classifier(fields.get('def', ''))
         self.stuff = None
         self.quality = None
-        self.qualifications = []
+        qualifications = []
         self.health = None
+        # The save's, set when the model is finished
+        self.hit_points = None
         self.biocoded = False
+        # Index of the map it lies on, set for loose things
+        self.map = 0
         try:
-            self.position = position(thing)
+            self.position = coordinates(fields.get('pos', ''))
         except AttributeError:
             self.position = (-1, -1,)
 
         try:
-            self.health = int(attribute(thing, 'health'))
+            self.health = int(fields.get('health', ''))
         except ValueError:
             self.health = 0
 
-        try:
-            self.biocoded = attribute(thing, 'biocoded') == 'True'
-        except ValueError:
-            pass
-
-        self.tainted = attribute(thing, 'wornbycorpse') == 'True'
-
-        if name.startswith('Meat_'):
-            self.category = 'Raw Food'
-            name = 'Meat'
-        elif name.startswith('Raw') or name.startswith('Egg'):
-            self.category = 'Raw Food'
-            name = name[3:]
-        elif name == 'Pemmican':
-            self.category = 'Meal'
-        elif '_' in name:
-            self.category, name = name.split('_', 1)
-
-        for category in Thing.TRUNCATE:
-            if name.startswith(category):
-                self.category = category
-                name = name[len(category):]
-        self.base_name = name
-
-        for category, items in Thing.CATEGORIES.items():
-            if name in items:
-                self.category = category
+        self.biocoded = fields.get('biocoded') == 'True'
+        self.tainted = fields.get('wornbycorpse') == 'True'
 
         if self.tainted:
             self.category = 'Tainted'
-
-        if self.category == 'Unfinished':
-            self.base_name = attribute(thing, 'recipe').split('_')[-1]
-            self.qualifications.append(attribute(thing, 'creatorname'))
-
-        if self.category in Thing.QUALITY:
-            self.stuff = attribute(thing, 'stuff')
-            if self.health % 5 == 0:
-                Thing.maxes[self.max_key] = max(self.health, Thing.maxes[self.max_key])
-            quality = attribute(thing, 'quality')
+        elif self.category == 'Unfinished':
+            self.base_name = sys.intern(fields.get('recipe', '').split('_')[-1])
+            qualifications.append(fields.get('creatorname', ''))
+        elif has_quality:
+            self.stuff = fields.get('stuff', '')
+            quality = fields.get('quality', '')
             if self.stuff:
-                if self.stuff == 'WoodLog':
-                    self.stuff = 'Wood'
-                elif self.stuff.startswith('Blocks'):
-                    self.stuff = self.stuff[6:]
-                self.qualifications.append(self.stuff)
+                self.stuff = classifier.stuff_name(self.stuff)
+                qualifications.append(self.stuff)
             if quality:
-                self.qualifications.append(quality)
-
-        self.count = int(attribute(thing, 'stackcount', '1'))
+                self.quality = sys.intern(quality)
+                qualifications.append(self.quality)
+
+        self.qualifications = tuple(qualifications)
+        self.count = int(fields.get('stackcount', '1'))
+
+    @classmethod
+    def columns(cls, things):
+        """ The things' values of each of COLUMNS """
+        return tuple([getattr(thing, name) for thing in things] for name in cls.COLUMNS)
+
+    @classmethod
+    def from_columns(cls, columns, hit_points):
+        """ The things whose values are in columns, with the hit points """
+        setters = [getattr(cls, name).__set__ for name in cls.COLUMNS]
+        things = []
+        for values in zip(*columns):
+            thing = cls.__new__(cls)
+            for setter, value in zip(setters, values):
+                setter(thing, value)
+            thing.hit_points = hit_points
+            things.append(thing)
+        return things
+
+    def record_health(self, maxes):
+        """ Counts the health toward the most seen for the kind of item. Only round healths count,
+        as items at their maximum have one and worn or damaged items mostly do not """
+        if self.stuff is not None and self.health % 5 == 0:
+            maxes[self.max_key] = max(self.health, maxes.get(self.max_key, 0))
 
     @property
     def max_key(self):
@@ -606,59 +1062,44 @@ class Thing:
         n = self.base_name
         if self.qualifications:
             n = '{:15} ({}'.format(self.base_name, ', '.join(self.qualifications))
-            if self.health and Thing.maxes[self.max_key]:
-                n += ' {}%'.format(int(100 * self.health / Thing.maxes[self.max_key]))
+            max_health = self.hit_points[self.max_key] if self.hit_points else 0
+            if self.health and max_health:
+                n += ' {}%'.format(int(100 * self.health / max_health))
             n += ')'
         return n
 
-class AncientDanger:
-    def __init__(self, soup):
-        self.zones = []
-        for thing in soup.find_all('thing'):
-            try:
-                rimworld_category = classname(thing)[0]
-            except IndexError:
-                continue
-            if rimworld_category == 'Building_AncientCryptosleepCasket':
-                try:
-                    if not thing.innercontainer.innerlist.li:
-                        continue
-                except AttributeError:
-                    continue
-                current_x, current_y = position(thing)
-                for zone in self.zones:
-                    if zone.maybe_add_point(current_x, current_y):
-                        break
-                else:
-                    self.zones.append(AncientDangerZone(current_x, current_y))
-
-    def contains(self, x, y):
-        for zone in self.zones:
-            if zone.contains(x, y):
-                return True
-
-class AncientDangerZone:
-    def __init__(self, init_x, init_y):
-        self.left = self.right = init_x
-        self.top = self.bottom = init_y
-
-    def maybe_add_point(self, x, y):
-        """ If point in general area, add the point and return true"""
-        if  -15 < x - self.left < 15 \
-            and -15 < x - self.right < 15 \
-            and -15 < y - self.top < 15 \
-            and -15 < y - self.bottom < 15:
-            self.top = max(self.top, y)
-            self.bottom = min(self.bottom, y)
-            self.left = min(self.left, x)
-            self.right = max(self.right, x)
-            return True
-
-    def contains(self, x, y):
-        """Is the point plausibly in the zone"""
-        return self.top + 5 > y > self.bottom - 5 and self.left -5  < x < self.right + 5
-
-def things_in_inventory(soup):
+class HitPoints:
+    """ The most hit points seen for each kind of item in one save, standing in for their maximums.
+    They come from the loose items and the colonists' gear, not prisoners' or the dead's, as the reports
+    counted before the model; so every report's percentages, and the order of where, include colonists' gear.
+    The gear is only counted once a maximum is asked for, as decoding it is most of what a pawn costs """
+    def __init__(self, maxes, pawns):
+        self.maxes = maxes
+        self.pawns = []
+        for pawn in pawns:
+            # Pawns of parts reused from an earlier model may have decoded their gear for it
+            if pawn.gear_maxes is None:
+                self.pawns.append(pawn)
+            else:
+                self.count(pawn.gear_maxes)
+
+    def __getitem__(self, max_key):
+        if self.pawns:
+            pawns, self.pawns = self.pawns, []
+            for pawn in pawns:
+                # Gear decoded earlier was counted then
+                pawn.items
+        return self.maxes.get(max_key, 0)
+
+    def count(self, maxes):
+        """ Adds the most hit points seen in a pawn's gear """
+        for max_key, health in maxes.items():
+            self.maxes[max_key] = max(health, self.maxes.get(max_key, 0))
+
+def things_in_inventory(model):
+    """ Counts of the loose items by category and name. The names' hit point percentages are against maximums
+    that count the colonists' gear, as the inventory did when it built every colonist; so naming the first item
+    decodes their gear """
     inventory = defaultdict(Counter)
     inventory['Medicine']['Industrial'] = 0
     inventory['Medicine']['Herbal'] = 0
@@ -667,40 +1108,33 @@ def things_in_inventory(soup):
     inventory['Misc']['WoodLog'] = 0
     inventory['Raw Food']['Total'] = 0
 
-    ancient_danger = AncientDanger(soup)
-    things = []
-    for thing in soup.find_all('thing'):
-        try:
-            rimworld_category = classname(thing)[0]
-        except IndexError:
-            continue
-        skip = False
-        if rimworld_category in ('ThingWithComps', 'Medicine', 'Apparel', 'UnfinishedThing'):
-            obj = Thing(thing)
-            if not ancient_danger.contains(*obj.position):
-                things.append(obj)
-        if "MinifiedThing" in rimworld_category:
-            obj = Thing(thing.innercontainer.innerlist.li)
-            things.append(obj)
-    for obj in things:
+    for obj in model.things:
         if not obj.biocoded:
             inventory[obj.category][obj.name] += obj.count
         if obj.category == 'Raw Food':
             inventory[obj.category]['Total'] += obj.count
     return inventory
 
-def inventory_list(soup):
+def inventory_data(model):
+    """ Counts by category and item, and the (low, critical) levels of the items that have them """
     critical_levels = {
         'WoodLog': (100, 50,),
         'Steel': (100, 50,),
         'Cloth': (90, 20,),
     }
-    pawn_cnt = len(all_pawns(soup, {}))
+    pawn_cnt = len(model.colonists)
     critical_levels['Industrial'] = (2*pawn_cnt, 1.5*pawn_cnt,)
     critical_levels['Total'] = (60*pawn_cnt, 30*pawn_cnt,)
-    animal_cnt = len(all_animals(soup))
+    animal_cnt = len(model.animals)
     critical_levels['Herbal'] = (1*animal_cnt, .5*animal_cnt,)
-    inventory = things_in_inventory(soup)
+    return {
+        'categories': {category: dict(sorted(counter.items())) for category, counter in sorted(things_in_inventory(model).items())},
+        'critical_levels': critical_levels,
+    }
+
+def inventory_list(data):
+    critical_levels = data['critical_levels']
+    inventory = data['categories']
     max_width = 0
     for c, k in inventory.items():
         max_width = max(max_width, len(c))
@@ -738,116 +1172,165 @@ def inventory_list(soup):
                 v = inventory[c][k]
                 print(' {}: {}'.format(k, v))
 
-def equipment_list(soup, options):
-    things_in_inventory(soup) # load Thing.maxes
-    pawns = []
-    def add_pawn(thing):
-        if attribute(thing, 'kinddef') in ('Colonist', 'Tribesperson',) and attribute(thing, 'faction') in COLONIST_FACTIONS:
-            pawns.append(Pawn(thing, options))
-
-    for alivepawns in soup.find_all('pawnsalive'):
-        for thing in alivepawns.findChildren('li', recursive=False):
-            add_pawn(thing)
+def inventory_rows(data):
+    return [{'category': category, 'item': item, 'count': count} for category, items in data['categories'].items() for item, count in items.items()]
 
-    for thing in soup.find_all('thing'):
-        add_pawn(thing)
+def equipment_data(model, options):
+    return [{
+        'name': pawn.name,
+        'armor_level': pawn.armor_level,
+        'combat_info': pawn.combat_info,
+        'items': {category: item.name for category, item in pawn.items.items()},
+    } for pawn in sorted(all_pawns(model, options), key=lambda x: x.name)]
 
+def equipment_list(data):
     max_width = 0
-    for pawn in pawns:
-        max_width = max(max_width, pawn.max_equipment_description)
+    for pawn in data:
+        for name in pawn['items'].values():
+            max_width = max(max_width, len(name))
 
     max_width += 6
 
     try:
         num_columns = math.floor(os.get_terminal_size()[0]/(max_width))
 
-        for pawn_chunk in chunker(sorted(pawns, key=lambda x: x.name), num_columns):
+        for pawn_chunk in chunker(data, num_columns):
             fmt = f"{{:{max_width}}}"*len(pawn_chunk)
-            print(fmt.format(*[pawn.name for pawn in pawn_chunk]))
-            print(fmt.format(*[f"    Armor Level: {pawn.armor_level:2} {pawn.combat_info}" for pawn in pawn_chunk]))
+            print(fmt.format(*[pawn['name'] for pawn in pawn_chunk]))
+            print(fmt.format(*[f"    Armor Level: {pawn['armor_level']:2} {pawn['combat_info']}" for pawn in pawn_chunk]))
             for key in Pawn.ITEM_CATEGORIES:
-                print(fmt.format(*[f"    {pawn.items[key].name}" for pawn in pawn_chunk]))
+                print(fmt.format(*[f"    {pawn['items'].get(key, NO_ITEM.name)}" for pawn in pawn_chunk]))
             print()
 
     except OSError:
-        for pawn in sorted(pawns, key=lambda x: x.name):
-            print(pawn.name)
-            print(f"    Armor Level: {pawn.armor_level:2} {pawn.combat_info}")
-            for item in pawn.items.values():
-                print("    {}".format(item.name))
+        for pawn in data:
+            print(pawn['name'])
+            print(f"    Armor Level: {pawn['armor_level']:2} {pawn['combat_info']}")
+            for name in pawn['items'].values():
+                print("    {}".format(name))
+
+def equipment_rows(data):
+    rows = []
+    for pawn in data:
+        row = {'name': pawn['name'], 'armor_level': pawn['armor_level'], 'combat_info': pawn['combat_info']}
+        row.update((category, pawn['items'].get(category)) for category in Pawn.ITEM_CATEGORIES)
+        rows.append(row)
+    return rows
 
 def chunker(seq, size):
     return (seq[pos:pos + size] for pos in range(0, len(seq), size))
 
-def harvest(soup):
-    counters = {
-        'herbs': Counter(),
-        'berries': Counter(),
-        'trees': Counter(),
-        'geysers': Counter(),
-        'ambrosia': Counter(),
-    }
-    for thing in soup.find_all('thing'):
-        name = attribute(thing, 'def')
+class Plant:
+    FIELDS = stream.Fields('def', 'pos', 'growth', 'sown',)
+    __slots__ = ('name', 'position', 'growth', 'sown',)
 
-        if name == 'SteamGeyser':
-            counters['geysers'][location(thing)] += 1
-            continue
-
-        growth = attribute(thing, 'growth')
-        if not growth == '1':
-            continue
+    def __init__(self, thing):
+        fields = Plant.FIELDS(thing)
+        self.name = sys.intern(fields.get('def', ''))
+        self.position = coordinates(fields.get('pos', ''))
+        self.growth = float(fields.get('growth', 0))
+        self.sown = fields.get('sown') == 'True'
+
+class PlantTable:
+    """ Plants as columns: index into names, x, y, growth, sown and whether in a hydroponics basin"""
+    def __init__(self, plants, basins):
+        import numpy
+        self.names = sorted({plant.name for plant in plants})
+        ids = {name: idx for idx, name in enumerate(self.names)}
+        count = len(plants)
+        self.name_id = numpy.fromiter((ids[plant.name] for plant in plants), numpy.int32, count)
+        self.x = numpy.fromiter((plant.position[0] for plant in plants), numpy.int32, count)
+        self.y = numpy.fromiter((plant.position[1] for plant in plants), numpy.int32, count)
+        self.growth = numpy.fromiter((plant.growth for plant in plants), numpy.float64, count)
+        self.sown = numpy.fromiter((plant.sown for plant in plants), numpy.bool_, count)
+        cells = numpy.array([(x << 16) + y for basin in basins for x, y in basin.cells], numpy.int64)
+        self.in_basin = numpy.isin((self.x.astype(numpy.int64) << 16) + self.y, cells)
+
+    def ids(self, names):
+        """ name_id values of the names """
+        return [idx for idx, name in enumerate(self.names) if name in names]
+
+    def crops(self, mask):
+        """ {crop: (count, mean growth, max growth)} of the plants in mask, by name without Plant_ """
+        import numpy
+        crop_names = [name.replace('Plant_', '') for name in self.names]
+        unique = sorted(set(crop_names))
+        lookup = numpy.array([unique.index(name) for name in crop_names], numpy.intp)
+        crop_ids = lookup[self.name_id[mask]]
+        growth = self.growth[mask]
+        counts = numpy.bincount(crop_ids, minlength=len(unique))
+        sums = numpy.bincount(crop_ids, weights=growth, minlength=len(unique))
+        maxes = numpy.zeros(len(unique))
+        numpy.maximum.at(maxes, crop_ids, growth)
+        return {unique[idx]: (int(counts[idx]), sums[idx] / counts[idx], maxes[idx],) for idx in numpy.flatnonzero(counts)}
+
+HARVEST_PLANTS = (
+    ('herbs', ('HealrootWild',),),
+    ('berries', ('Plant_Berry', 'Plant_Agave',),),
+    ('trees', ('Plant_TreeDrago', 'Plant_SaguaroCactus',),),
+    ('geysers', (),),
+    ('ambrosia', ('Plant_Ambrosia',),),
+)
 
-        if name in ('Plant_Berry', 'Plant_Agave',):
-            counters['berries'][location(thing)] += 1
-        elif name in ('HealrootWild',):
-            counters['herbs'][location(thing)] += 1
-        elif name in ('Plant_TreeDrago', 'Plant_SaguaroCactus',):
-            counters['trees'][location(thing)] += 1
-        elif name == 'Plant_Ambrosia':
-            counters['ambrosia'][location(thing)] += 1
-    title_list = []
-    data = []
-    formats = []
-    for key, counter in counters.items():
-        if counter:
-            title_list.append(key)
-            data.append(counter)
-            formats.append('{:2}')
+def harvest_data(model):
+    """ Ripe wild plants and geysers in each location, for each kind that has any """
+    import numpy
+    table = model.plant_table
+    ripe = table.growth == 1
+    ripe_regions = regions(table.x[ripe], table.y[ripe])
+    ripe_ids = table.name_id[ripe]
+    locations = [loc for row in LOCATIONS for loc in row]
+    counters = {}
+    for key, names in HARVEST_PLANTS:
+        counts = numpy.bincount(ripe_regions[numpy.isin(ripe_ids, table.ids(names))], minlength=9)
+        counters[key] = Counter({locations[idx]: int(count) for idx, count in enumerate(counts) if count})
+    for x, y in model.geysers:
+        counters['geysers'][location(x, y)] += 1
+    return {key: dict(counter) for key, counter in counters.items() if counter}
+
+def harvest(data):
+    formats = ['{:2}'] * len(data)
     fmt = f"{'/'.join(formats)} | {'/'.join(formats)} | {'/'.join(formats)}"
-    print('/'.join(title_list))
+    print('/'.join(data))
     for locs in (('NW', 'N', 'NE',), ('W', 'C', 'E',), ('SW', 'S', 'SE',),):
         data_points = []
         for loc in locs:
-            for counter in data:
-                data_points.append(counter[loc])
+            for counter in data.values():
+                data_points.append(counter.get(loc, 0))
         print(fmt.format(*data_points))
 
-def quests(soup):
-    def untag(string):
-        return re.sub(r'(<[^>]+>|\([*/][^)]+\))', '', string).replace('\n\n', '\n')
-    for quests in soup.find_all('quests'):
-        for li in quests.findChildren('li', recursive=False):
-            if not attribute(li, 'cleanedup'):
-                print(attribute(li, 'name'))
-                print(untag(attribute(li, 'description')))
-                print('='*25)
+def harvest_rows(data):
+    return [{'kind': kind, 'location': loc, 'count': count} for kind, counter in data.items() for loc, count in counter.items()]
+
+def untag(string):
+    return re.sub(r'(<[^>]+>|\([*/][^)]+\))', '', string).replace('\n\n', '\n')
+
+def quests_data(model):
+    return [{'name': name, 'description': untag(description)} for name, description in model.quests]
+
+def quests(data):
+    for quest in data:
+        print(quest['name'])
+        print(quest['description'])
+        print('='*25)
 
 class Bill:
+    FIELDS = stream.Fields('suspended', 'recipe', 'repeatmode', 'targetcount', 'repeatcount',)
+    __slots__ = ('suspended', 'recipe', 'repeat_type', 'count', 'materials',)
+
     def __init__(self, bill_node):
-        self.suspended = attribute(bill_node, 'suspended') == 'True'
-        self.recipe = attribute(bill_node, 'recipe')
-        self.repeat_type = attribute(bill_node, 'repeatmode')
+        fields = Bill.FIELDS(bill_node)
+        self.suspended = fields.get('suspended') == 'True'
+        self.recipe = sys.intern(fields.get('recipe', ''))
+        self.repeat_type = sys.intern(fields.get('repeatmode', ''))
         if self.repeat_type == 'TargetCount':
-            self.count = int(attribute(bill_node, 'targetcount', 0))
-        elif attribute(bill_node, 'repeatmode') == 'RepeatCount':
-            self.count = int(attribute(bill_node, 'repeatcount', 0))
-        elif attribute(bill_node, 'repeatmode') == 'Forever':
+            self.count = int(fields.get('targetcount', 0))
+        elif self.repeat_type == 'RepeatCount':
+            self.count = int(fields.get('repeatcount', 0))
+        elif self.repeat_type == 'Forever':
             self.count = -1
 
-        self.materials = []
-        for li in bill_node.ingredientfilter.alloweddefs.find_all('li'):
-            self.materials.append(li.text)
+        self.materials = tuple(sys.intern(li.text) for li in bill_node.ingredientfilter.alloweddefs.find_all('li'))
 
     @property
     def formatted_recipe(self):
@@ -865,27 +1348,28 @@ class Bill:
     def __lt__(self, other):
         return self.recipe < other.recipe
 
-def injuries(soup, options):
+def injuries_data(model, options):
+    """ Lasting injuries of colonists then prisoners, by name """
     missing = set()
-    def print_injuries(pawn):
+    pawns = []
+    for pawn in sorted(model.colonists, key=lambda x: x.name) + sorted(all_prisoners(model), key=lambda x: x.name):
         if pawn.injuries:
             missing.update(pawn.missing_body_part_nums)
-            print(pawn.name)
-            for injury in pawn.injuries:
-                print(injury)
-
-    for pawn in sorted(all_pawns(soup, options), key=lambda x: x.name):
-        print_injuries(pawn)
-
-    for pawn in sorted(all_prisoners(soup), key=lambda x: x.name):
-        print_injuries(pawn)
-
-    for m in sorted(list(missing)):
+            pawns.append({'name': pawn.name, 'injuries': [injury.strip() for injury in pawn.injuries]})
+    return {'pawns': pawns, 'missing': sorted(missing)}
+
+def injuries(data):
+    for pawn in data['pawns']:
+        print(pawn['name'])
+        for injury in pawn['injuries']:
+            print(f" {injury}")
+    for m in data['missing']:
         print(m)
 
-def hydroponics_positions(thing):
-    x, y = position(thing)
-    rot = attribute(thing, 'rot')
+def injury_rows(data):
+    return [{'name': pawn['name'], 'injury': injury} for pawn in data['pawns'] for injury in pawn['injuries']]
+
+def hydroponics_positions(x, y, rot):
     if not rot:
         return ((x, y - 1,), (x, y,), (x, y + 1,), (x, y + 2,),)
     if rot == '2':
@@ -895,109 +1379,110 @@ def hydroponics_positions(thing):
     if rot == '3':
         return ((x - 2, y,), (x - 1, y,), (x, y,), (x + 1, y,),)
 
-def queue(soup):
+class Basin:
+    FIELDS = stream.Fields('pos', 'rot', 'poweron', 'plantdeftogrow',)
+    __slots__ = ('plant', 'cells',)
+
+    def __init__(self, thing):
+        fields = Basin.FIELDS(thing)
+        if fields.get('poweron') == 'False':
+            self.plant = 'Off'
+        else:
+            self.plant = fields.get('plantdeftogrow', '').replace('Plant_', '')
+        self.cells = hydroponics_positions(*coordinates(fields.get('pos', '')), fields.get('rot'))
+
+def crops_data(crops, estimates):
+    """ Mean and best growth of each crop, and days to ripe for crops with an estimate """
+    data = []
+    for crop in sorted(crops):
+        count, mean_growth, max_growth = crops[crop]
+        row = {'crop': crop, 'count': count, 'growth': mean_growth, 'best_growth': max_growth, 'days': None, 'best_days': None}
+        if crop in estimates:
+            row['days'] = estimates[crop]*(1 - mean_growth)
+            row['best_days'] = estimates[crop]*(1 - max_growth)
+        data.append(row)
+    return data
+
+def queue_data(model):
+    """ What is growing and what is queued to be made """
     basins = Counter()
-    basin_crops = Counter()
-    crops = Counter()
-    repeat_bills = []
-    target_bills = []
-    forever_bills = []
-    basin_growths = defaultdict(list)
-    growths = defaultdict(list)
-    hydroponics_zones = []
-    mine_ctr = 0
-
-    for designations in soup.find_all('alldesignations'):
-        for li in designations.find_all('li'):
-            if attribute(li, 'def') == 'Mine':
-                mine_ctr += 1
-
-    for thing in soup.find_all('thing'):
-        if attribute(thing, 'def') == 'HydroponicsBasin':
-            if attribute(thing, 'poweron') == 'False':
-                plant = 'Off'
-            else:
-                plant = attribute(thing, 'plantdeftogrow').replace('Plant_', '')
-            basins[plant] += 1
-            hydroponics_zones.extend(hydroponics_positions(thing))
-    for thing in soup.find_all('thing'):
-        name = attribute(thing, 'def')
-        if attribute(thing, 'sown') == 'True':
-            x, y = position(thing)
-            name = name.replace('Plant_', '')
-            if (x, y,) in hydroponics_zones:
-                basin_crops[name] += 1
-                basin_growths[name].append(float(attribute(thing, 'growth', 0)))
-            else:
-                crops[name] += 1
-                growths[name].append(float(attribute(thing, 'growth', 0)))
-        for stack in thing.find_all('bills'):
-            for bill_node in stack.find_all('li', recursive=False):
-                bill = Bill(bill_node)
-                if bill.suspended:
-                    continue
-                if bill.count == 0:
-                    continue
-                if  bill.repeat_type == 'TargetCount':
-                    target_bills.append(bill)
-                elif bill.repeat_type == 'RepeatCount':
-                    repeat_bills.append(bill)
-                elif bill.repeat_type == 'Forever':
-                    forever_bills.append(bill)
-    if basins:
+    bills = {'RepeatCount': [], 'TargetCount': [], 'Forever': []}
+    for basin in model.basins:
+        basins[basin.plant] += 1
+    table = model.plant_table
+    for bill in sorted(model.bills):
+        if bill.suspended or bill.count == 0:
+            continue
+        if bill.repeat_type in bills:
+            bills[bill.repeat_type].append({'recipe': bill.formatted_recipe, 'count': bill.count})
+    return {
+        'basins': {basin: basins[basin] for basin in sorted(basins)},
+        'crops': crops_data(table.crops(table.sown & ~table.in_basin), RIPE_ESTIMATES),
+        'basin_crops': crops_data(table.crops(table.sown & table.in_basin), BASIN_RIPE_ESTIMATES),
+        'repeat_bills': bills['RepeatCount'],
+        'target_bills': bills['TargetCount'],
+        'forever_bills': bills['Forever'],
+        'mines': model.designations['Mine'],
+    }
+
+def print_crops(title, crops):
+    print(title)
+    for crop in crops:
+        if crop['days'] is not None:
+            mean = f"{crop['days']: >4.1f}"
+            maximum = f"{crop['best_days']: >4.1f}"
+        else:
+            mean = f"{crop['growth']:.2f}"
+            maximum = f"{crop['best_growth']:.2f}"
+        print(f"  {crop['crop']:15}: {crop['count']:4} ({mean}, {maximum})")
+    print()
+
+def queue(data):
+    if data['basins']:
         print('Basins')
-        for basin in sorted(basins):
-            print(f"  {basin:15}: {basins[basin]:4}")
+        for basin, count in data['basins'].items():
+            print(f"  {basin:15}: {count:4}")
         print()
-    if crops:
-        print('Crops')
-        for crop in sorted(crops):
-            count = crops[crop]
-            if crop in RIPE_ESTIMATES:
-                estimate = RIPE_ESTIMATES[crop]
-                mean = f"{statistics.mean([estimate*(1 - growth) for growth in growths[crop]]): >4.1f}"
-                maximum = f"{min([estimate*(1 - growth) for growth in growths[crop]]): >4.1f}"
-            else:
-                mean = f"{statistics.mean(growths[crop]):.2f}"
-                maximum = f"{max(growths[crop]):.2f}"
-            print(f"  {crop:15}: {count:4} ({mean}, {maximum})")
-        print()
-    if basin_crops:
-        print('Basin Crops')
-        for crop in sorted(basin_crops):
-            count = basin_crops[crop]
-            if crop in BASIN_RIPE_ESTIMATES:
-                estimate = BASIN_RIPE_ESTIMATES[crop]
-                mean = f"{statistics.mean([estimate*(1 - growth) for growth in basin_growths[crop]]): >4.1f}"
-                maximum = f"{min([estimate*(1 - growth) for growth in basin_growths[crop]]): >4.1f}"
-            else:
-                mean = f"{statistics.mean(basin_growths[crop]):.2f}"
-                maximum = f"{max(basin_growths[crop]):.2f}"
-            print(f"  {crop:15}: {count:4} ({mean}, {maximum})")
-        print()
-    if repeat_bills:
+    if data['crops']:
+        print_crops('Crops', data['crops'])
+    if data['basin_crops']:
+        print_crops('Basin Crops', data['basin_crops'])
+    if data['repeat_bills']:
         print('Bills')
-        for bill in sorted(repeat_bills):
-            print(f"  {bill.formatted_recipe:20}: {bill.count:3}")
+        for bill in data['repeat_bills']:
+            print(f"  {bill['recipe']:20}: {bill['count']:3}")
         print()
-    if target_bills:
+    if data['target_bills']:
         print('Bills with Target')
-        for bill in sorted(target_bills):
-            print(f"  {bill.formatted_recipe:20}: {bill.count:3}")
+        for bill in data['target_bills']:
+            print(f"  {bill['recipe']:20}: {bill['count']:3}")
         print()
-    if forever_bills:
+    if data['forever_bills']:
         print('Repeat Forever')
-        for bill in sorted(forever_bills):
-            print(f"  {bill.formatted_recipe}")
+        for bill in data['forever_bills']:
+            print(f"  {bill['recipe']}")
 
-    if mine_ctr:
+    if data['mines']:
         print()
-        print(f"{mine_ctr} mines")
-
-def top(soup, quantity, options):
+        print(f"{data['mines']} mines")
+
+def queue_rows(data):
+    rows = [{'section': 'basins', 'name': basin, 'count': count} for basin, count in data['basins'].items()]
+    for section in ('crops', 'basin_crops',):
+        for crop in data[section]:
+            row = {'section': section, 'name': crop['crop']}
+            row.update((key, value) for key, value in crop.items() if key != 'crop')
+            rows.append(row)
+    for section in ('repeat_bills', 'target_bills', 'forever_bills',):
+        rows.extend({'section': section, 'name': bill['recipe'], 'count': bill['count']} for bill in data[section])
+    rows.append({'section': 'mines', 'count': data['mines']})
+    return rows
+
+def top_data(model, options, quantity=None):
+    """ The best colonists at each skill, and who is among the best at the production skills """
     top = defaultdict(list)
     null_skill = {'level': 0, 'passion': None, 'pct': 0}
-    pawn_objs = all_pawns(soup, options)
+    pawn_objs = all_pawns(model, options)
     useful = {}
     half_useful = {}
     for pawn in pawn_objs:
@@ -1009,89 +1494,460 @@ def top(soup, quantity, options):
                 top[skill].append((pawn.name, pawn.skills[skill],))
             except ValueError:
                 top[skill].append((pawn.name, null_skill,))
-    def formatted_pawn(pawn):
-        name, skill_info = pawn
-        if skill_info['passion'] == 'Major':
-            return f"{name:>20} (\033[92;1m{skill_info['level']:>2}\033[00m)"
-        if skill_info['passion'] == 'Minor':
-            return f"{name:>20} (\033[92m{skill_info['level']:>2}\033[00m)"
-        return f"{name:>20} ({skill_info['level']:>2})"
     useful_skills = {'Construction', 'Mining', 'Cooking', 'Plants', 'Crafting', 'Intellectual',}
+    skills = {}
     for skill in SKILLS:
         pawns = sorted(top[skill], key=lambda x: int(x[1]['level']) + float(x[1]['pct']), reverse=True)
-        print(f"{skill:14} {''.join([formatted_pawn(pawn) for pawn in pawns[:quantity or 4]])}\n")
+        skills[skill] = [{'name': name, 'level': int(info['level']), 'passion': info['passion']} for name, info in pawns[:quantity or 4]]
         if skill in useful_skills:
             for idx, pawn in enumerate(pawns):
                 if idx < 4:
                     useful[pawn[0]].append(skill)
                 elif int(pawn[1]['level']) > 6:
                     half_useful[pawn[0]].append(skill)
-    print('\nProduction Utility')
-    for pawn in sorted(useful, key=lambda x: len(useful[x]) + len(half_useful[x])/2, reverse=True):
-        print(f"{pawn}: {', '.join(useful[pawn])}")
+    utility = [{'name': pawn, 'skills': useful[pawn]} for pawn in sorted(useful, key=lambda x: len(useful[x]) + len(half_useful[x])/2, reverse=True)]
+    return {'skills': skills, 'utility': utility}
 
-def where(soup):
-    ancient_danger = AncientDanger(soup)
-    things = []
-    for thing in soup.find_all('thing'):
-        try:
-            rimworld_category = classname(thing)[0]
-        except IndexError:
+def top(data):
+    def formatted_pawn(pawn):
+        if pawn['passion'] == 'Major':
+            return f"{pawn['name']:>20} (\033[92;1m{pawn['level']:>2}\033[00m)"
+        if pawn['passion'] == 'Minor':
+            return f"{pawn['name']:>20} (\033[92m{pawn['level']:>2}\033[00m)"
+        return f"{pawn['name']:>20} ({pawn['level']:>2})"
+    for skill, pawns in data['skills'].items():
+        print(f"{skill:14} {''.join([formatted_pawn(pawn) for pawn in pawns])}\n")
+    print('\nProduction Utility')
+    for pawn in data['utility']:
+        print(f"{pawn['name']}: {', '.join(pawn['skills'])}")
+
+def top_rows(data):
+    rows = [{'skill': skill, 'rank': rank, **pawn} for skill, pawns in data['skills'].items() for rank, pawn in enumerate(pawns, 1)]
+    rows.extend({'skill': 'Production Utility', 'rank': rank, 'name': pawn['name'], 'useful': ', '.join(pawn['skills'])} for rank, pawn in enumerate(data['utility'], 1))
+    return rows
+
+def where_data(model):
+    """ Where each item is, with its map, its room on that map, whether that room reaches the map edge,
+    whether it is in a stockpile and whether it is under a roof (None when the map has no roof grid) """
+    things = sorted(model.things, key=lambda x: x.name)
+    places = {}
+    for map_index, rooms in model.rooms.items():
+        on_map = [thing for thing in things if thing.map == map_index]
+        positions = [thing.position for thing in on_map]
+        in_rooms = rooms.cells(positions)
+        in_stockpiles = rooms.lookup(rooms.stockpiles, positions)
+        roofed = rooms.lookup(rooms.roofed, positions) if rooms.roofed is not None else [None] * len(on_map)
+        for thing, room, stockpile, roof in zip(on_map, in_rooms, in_stockpiles, roofed):
+            places[thing] = {'room': int(room), 'outside': bool(rooms.outside[room]), 'stockpile': bool(stockpile), 'roofed': None if roof is None else bool(roof)}
+    return [{'name': thing.base_name, 'map': thing.map, 'x': thing.position[0], 'y': thing.position[1], **places[thing]} for thing in things]
+
+def where(data):
+    for thing in data:
+        notes = [f"room {thing['room']}"] if thing['room'] and not thing['outside'] else []
+        if thing['map']:
+            notes.insert(0, f"map {thing['map']}")
+        if thing['stockpile']:
+            notes.append('stockpile')
+        if thing['roofed'] is False:
+            notes.append('unroofed')
+        print(thing['name'], (thing['x'], thing['y'],), *([', '.join(notes)] if notes else []))
+
+def skill_xp(level, xp):
+    """ Total xp behind a skill level and the progress toward the next"""
+    return sum(SKILL_UPGRADE[l] for l in range(int(level))) + xp
+
+def inventory_counts(model):
+    counts = Counter()
+    for thing in model.things:
+        if not thing.biocoded:
+            counts[(thing.category, thing.max_key,)] += thing.count
+    return counts
+
+def bill_counts(model):
+    return Counter((bill.formatted_recipe, bill.repeat_type, getattr(bill, 'count', 0), bill.suspended,) for bill in model.bills)
+
+def diff_data(old, new):
+    """ What changed between two models of a save: things added and removed by kind, inventory counts,
+    new lasting injuries and wounds, bills and skill xp """
+    old_things = {thing.id: thing for thing in old.things}
+    new_things = {thing.id: thing for thing in new.things}
+    added = Counter()
+    removed = Counter()
+    changed = 0
+    for thing_id, thing in new_things.items():
+        before = old_things.get(thing_id)
+        if before is None:
+            added[thing.max_key] += 1
+        elif (before.count, before.health, before.position,) != (thing.count, thing.health, thing.position,):
+            changed += 1
+    for thing_id, thing in old_things.items():
+        if thing_id not in new_things:
+            removed[thing.max_key] += 1
+
+    counts = inventory_counts(new)
+    counts.subtract(inventory_counts(old))
+    inventory = defaultdict(dict)
+    for (category, label,), delta in sorted(counts.items()):
+        if delta:
+            inventory[category][label] = delta
+
+    old_pawns = {pawn.name: pawn for pawn in old.colonists + old.prisoners}
+    injuries = []
+    for pawn in sorted(new.colonists + new.prisoners, key=lambda x: x.name):
+        before = old_pawns.get(pawn.name)
+        new_injuries = [injury for injury in pawn.injuries if before is None or injury not in before.injuries]
+        wounds = len(pawn.temporary_injuries) - (len(before.temporary_injuries) if before else 0)
+        if new_injuries or wounds > 0:
+            injuries.append({'name': pawn.name, 'injuries': [injury.strip() for injury in new_injuries], 'wounds': max(wounds, 0)})
+
+    bill_deltas = bill_counts(new)
+    bill_deltas.subtract(bill_counts(old))
+    bills = [{
+        'recipe': recipe,
+        'repeat_type': repeat_type,
+        'count': count,
+        'suspended': suspended,
+        'delta': delta,
+    } for (recipe, repeat_type, count, suspended,), delta in sorted(bill_deltas.items()) if delta]
+
+    skills = []
+    for pawn in sorted(new.colonists, key=lambda x: x.name):
+        before = old_pawns.get(pawn.name)
+        if before is None:
             continue
-        skip = False
-        if rimworld_category in ('ThingWithComps', 'Medicine', 'Apparel', 'UnfinishedThing'):
-            obj = Thing(thing)
-            if not ancient_danger.contains(*obj.position):
-                things.append(obj)
-        if "MinifiedThing" in rimworld_category:
-            obj = Thing(thing.innercontainer.innerlist.li)
-            things.append(obj)
-    for thing in sorted(things, key=lambda x: x.name):
-        print(thing.base_name, thing.position)
-
-def test(soup, options):
+        gains = []
+        for skill in SKILLS:
+            if skill in pawn.raw_skills and skill in before.raw_skills:
+                level, _, xp = pawn.raw_skills[skill]
+                old_level, _, old_xp = before.raw_skills[skill]
+                gain = skill_xp(level, xp) - skill_xp(old_level, old_xp)
+                if abs(gain) >= 1:
+                    gains.append({'skill': skill, 'xp': gain, 'old_level': old_level, 'level': level})
+        if gains:
+            skills.append({'name': pawn.name, 'gains': gains})
+    return {
+        'things': {'added': dict(sorted(added.items())), 'removed': dict(sorted(removed.items())), 'changed': changed},
+        'inventory': dict(sorted(inventory.items())),
+        'injuries': injuries,
+        'bills': bills,
+        'skills': skills,
+    }
+
+def diff_models(data):
+    things = data['things']
+    print(f"Things: {sum(things['added'].values())} added, {sum(things['removed'].values())} removed, {things['changed']} changed")
+    for label, count in things['added'].items():
+        print(f"  + {label} x{count}")
+    for label, count in things['removed'].items():
+        print(f"  - {label} x{count}")
+    print()
+
+    if data['inventory']:
+        print('Inventory')
+        for category, deltas in data['inventory'].items():
+            print(f"  {category}")
+            for label, delta in deltas.items():
+                print(f"    {label:20} {delta:+}")
+        print()
+
+    if data['injuries']:
+        print('Injuries')
+        for pawn in data['injuries']:
+            print(pawn['name'])
+            for injury in pawn['injuries']:
+                print(f"   {injury}")
+            if pawn['wounds']:
+                print(f"  {pawn['wounds']} new wounds")
+        print()
+
+    if data['bills']:
+        print('Bills')
+        for bill in data['bills']:
+            for _ in range(abs(bill['delta'])):
+                print(f"  {'+' if bill['delta'] > 0 else '-'} {bill['recipe']} ({bill['repeat_type']} {bill['count']}{', suspended' if bill['suspended'] else ''})")
+        print()
+
+    if data['skills']:
+        print('Skill xp')
+        for pawn in data['skills']:
+            gains = []
+            for gain in pawn['gains']:
+                levels = f" ({gain['old_level']}->{gain['level']})" if gain['level'] != gain['old_level'] else ''
+                gains.append(f"{gain['skill']} {gain['xp']:+.0f}{levels}")
+            print(f"{pawn['name']:{BUFFER_WIDTH}} {', '.join(gains)}")
+
+def diff_rows(data):
+    rows = [{'section': 'things', 'name': label, 'delta': count} for label, count in data['things']['added'].items()]
+    rows.extend({'section': 'things', 'name': label, 'delta': -count} for label, count in data['things']['removed'].items())
+    rows.extend({'section': 'inventory', 'category': category, 'name': label, 'delta': delta} for category, deltas in data['inventory'].items() for label, delta in deltas.items())
+    for pawn in data['injuries']:
+        rows.extend({'section': 'injuries', 'name': pawn['name'], 'injury': injury} for injury in pawn['injuries'])
+        if pawn['wounds']:
+            rows.append({'section': 'wounds', 'name': pawn['name'], 'delta': pawn['wounds']})
+    rows.extend({'section': 'bills', 'name': bill['recipe'], **{key: value for key, value in bill.items() if key != 'recipe'}} for bill in data['bills'])
+    rows.extend({'section': 'skills', 'name': pawn['name'], **gain} for pawn in data['skills'] for gain in pawn['gains'])
+    return rows
+
+def diff(paths, use_cache=True, output_format='terminal', output=None):
+    """ Compares two saves, or a save with the model cached when it was last read.
+    Chunks of the second save that are identical to the first are not extracted again"""
+    import defs
+    if len(paths) == 2:
+        old, parts = chunked_model(paths[0], bodies=defs.for_save(paths[0]))
+        new, _ = chunked_model(paths[1], parts, defs.for_save(paths[1]))
+    else:
+        old = cache.load_previous(paths[0], model_version(defs.for_save(paths[0])))
+        if old is None:
+            print(f"No earlier model of {paths[0]} is cached")
+            return
+        new = load_model(paths[0], use_cache)
+    data = diff_data(old, new)
+    if output_format == 'terminal':
+        diff_models(data)
+    else:
+        render.write(output_format, data, diff_rows(data), output)
+
+def test(model, options):
     """
     For ad hoc
     """
 
-def run(args):
-    config = ConfigParser()
-    config.read(CONFIG)
+# Action: (data function, what it takes besides the model, terminal renderer, rows for the tabular formats)
+REPORTS = {
+    'skills': (pawns_data, ('options',), pawn_skills, pawn_rows,),
+    'inventory': (inventory_data, (), inventory_list, inventory_rows,),
+    'equipment': (equipment_data, ('options',), equipment_list, equipment_rows,),
+    'animals': (animals_data, (), animals, animal_rows,),
+    'wildlife': (wildlife_data, (), animals, animal_rows,),
+    'harvest': (harvest_data, (), harvest, harvest_rows,),
+    'dead': (dead_data, (), all_dead, dead_rows,),
+    'injury': (injuries_data, ('options',), injuries, injury_rows,),
+    'quests': (quests_data, (), quests, list,),
+    'queue': (queue_data, (), queue, queue_rows,),
+    'top': (top_data, ('options', 'quantity',), top, top_rows,),
+    'where': (where_data, (), where, list,),
+    'test': (test, ('options',), lambda data: None, lambda data: [],),
+}
+
+def report_data(action, model, options, quantity=None):
+    """ The plain data behind a report """
+    data, takes, _, _ = REPORTS[action]
+    arguments = {'options': options, 'quantity': quantity}
+    return data(model, *[arguments[name] for name in takes])
+
+def report(action, model, options, quantity=None, output_format='terminal', output=None):
+    data = report_data(action, model, options, quantity)
+    _, _, terminal, rows = REPORTS[action]
+    if output_format == 'terminal':
+        terminal(data)
+    else:
+        render.write(output_format, data, rows(data), output)
+
+
+def run_faction(action, options, quantity=None, use_cache=True, faction=None):
+    """ Runs one report in a worker, recording the save in the history if faction is given.
+    Returns its output and the updated options"""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        model = load_model(options['file'], use_cache)
+        if faction:
+            import history
+            history.record(faction, options['file'], model)
+        report(action, model, options, quantity)
+    return output.getvalue(), options
+
+def run_all(config, args):
+    """ Runs the action against every configured save in a process pool
+    and prints the reports in config order"""
+    from concurrent.futures import ProcessPoolExecutor
+    failures = []
+    fs = factions(config)
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = [executor.submit(run_faction, args.all, Options(config[faction]), args.quantity, not args.no_cache, faction if args.history else None) for faction in fs]
+        for faction, future in zip(fs, futures):
+            print(f"== {faction} ==")
+            try:
+                output, options = future.result()
+            except Exception as e:
+                failures.append(faction)
+                print(f"Failed: {e!r}")
+                continue
+            print(output)
+            config[faction].update(options.changed(config[faction]))
+    if args.all == 'skills':
+        with open(CONFIG, 'w') as f:
+            config.write(f)
+    if failures:
+        print(f"{len(failures)} of {len(fs)} saves failed: {', '.join(failures)}", file=sys.stderr)
+
+class WatchedSave:
+    """ The latest reports for a faction's save. Sections of the save that have
+    not changed since the last refresh are not extracted again, and a save whose
+    content has not changed is not recorded in the history again"""
+    def __init__(self, faction, options, actions, quantity=None, record_history=False):
+        self.faction = faction
+        self.record_history = record_history
+        self.options = options
+        self.path = os.path.abspath(options['file'])
+        self.actions = actions
+        self.quantity = quantity
+        self.parts = None
+        self.output = ''
+        self.updated = 'waiting'
+
+    def refresh(self):
+        import defs
+        started = time.perf_counter()
+        bodies = defs.for_save(self.path)
+        previous = self.parts
+        model, self.parts = chunked_model(self.path, self.parts, bodies)
+        cache.store(self.path, model_version(bodies), model)
+        # The part digests cover the whole file, so the same digests mean the same content
+        if self.record_history and (previous is None or previous.keys() != self.parts.keys()):
+            import history
+            history.record(self.faction, self.path, model)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            for action in self.actions:
+                print(f"-- {action} --")
+                report(action, model, self.options, self.quantity)
+                print()
+        self.output = output.getvalue()
+        self.updated = f"{time.strftime('%H:%M:%S')}, {time.perf_counter() - started:.2f}s"
+
+def show_watched(saves):
+    if sys.stdout.isatty():
+        print('\033[H\033[2J', end='')
+    for save in saves:
+        print(f"== {save.faction} ({save.updated}) ==")
+        print(save.output)
+    sys.stdout.flush()
+
+def watch_saves(config, fs, actions, quantity=None, record_history=False):
+    """ Refreshes the reports for the factions' saves each time one is written, until interrupted.
+    Saves are re-read one at a time in a background thread while this one waits for the next write"""
+    from concurrent.futures import ThreadPoolExecutor
+    import watch
+    saves = [WatchedSave(faction, config[faction], actions, quantity, record_history) for faction in fs]
+    by_path = {save.path: save for save in saves}
+    watcher = watch.Watcher(by_path)
+    queued = set()
+    def refresh(save):
+        queued.discard(save)
+        try:
+            save.refresh()
+        except Exception as e:
+            save.output = f"Failed: {e!r}\n"
+            save.updated = time.strftime('%H:%M:%S')
+        show_watched(saves)
+
+    executor = ThreadPoolExecutor(1)
+    try:
+        for save in saves:
+            queued.add(save)
+            executor.submit(refresh, save)
+        while True:
+            for path in watcher.wait():
+                save = by_path[path]
+                if save not in queued:
+                    queued.add(save)
+                    executor.submit(refresh, save)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+@contextmanager
+def profiling(args):
+    """ Per-phase timings and call counts with --profile (and peak Python memory with --profile-memory),
+    cProfile stats with --profile-dump """
+    if args.profile or args.profile_memory:
+        timing.enable(args.profile_memory)
+        timing.count_calls(sys.modules[__name__], ('attribute', 'coordinates', 'classname',))
+    if args.profile_dump:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    yield
+    if args.profile_dump:
+        profiler.disable()
+        profiler.dump_stats(args.profile_dump)
+    if args.profile or args.profile_memory:
+        timing.summary()
+
+def run_report(args, config):
     options = config[args.faction]
-    with open(options['file']) as f:
-        soup = BeautifulSoup(f, 'lxml')
+    with profiling(args):
+        model = load_model(options['file'], not args.no_cache, args.jobs)
+        undecoded = model.undecoded()
+        if args.history:
+            import history
+            with timing.phase('history'):
+                history.record(args.faction, options['file'], model)
+        with timing.phase('report'):
+            report(args.action, model, options, args.quantity, args.format, args.output)
+        if not args.no_cache and model.undecoded() < undecoded:
+            # So the next report of the save starts from what this one decoded
+            import defs
+            with timing.phase('cache store'):
+                cache.store(options['file'], model_version(defs.for_save(options['file'])), model)
     if args.action == 'skills':
-        pawn_skills(soup, options)
         with open(CONFIG, 'w') as f:
             config.write(f)
-    elif args.action == 'inventory':
-        inventory_list(soup)
-    elif args.action == 'equipment':
-        equipment_list(soup, options)
-    elif args.action == 'animals':
-        animals(soup)
-    elif args.action == 'wildlife':
-        wildlife(soup)
-    elif args.action == 'harvest':
-        harvest(soup)
-    elif args.action == 'dead':
-        all_dead(soup)
-    elif args.action == 'injury':
-        injuries(soup, options)
-    elif args.action == 'quests':
-        quests(soup)
-    elif args.action == 'queue':
-        queue(soup)
-    elif args.action == 'top':
-        top(soup, args.quantity, options)
-    elif args.action == 'where':
-        where(soup)
-    elif args.action == 'test':
-        test(soup, options)
-if __name__ == '__main__':
+
+def run_diff(args, config):
+    with profiling(args), timing.phase('diff'):
+        diff(args.files or [config[args.faction]['file']], not args.no_cache, args.format, args.output)
+
+def run_watch(args, config):
+    watch_saves(config, [args.faction], args.reports, args.quantity, args.history)
+
+# Action: what runs it for one faction
+COMMANDS = dict.fromkeys(ACTIONS, run_report)
+COMMANDS.update({
+    'diff': run_diff,
+    'watch': run_watch,
+})
+
+def run(args):
+    config = ConfigParser()
+    config.read(CONFIG)
+    if args.all == 'watch':
+        watch_saves(config, factions(config), args.reports, args.quantity, args.history)
+    elif args.all:
+        run_all(config, args)
+    else:
+        COMMANDS[args.action](args, config)
+
+def main():
     parser = ArgumentParser()
-    parser.add_argument("faction", help="name of faction")
-    parser.add_argument("action", choices=['equipment', 'dead', 'skills', 'inventory', 'animals', 'harvest', 'wildlife', 'quests', 'queue', 'injury', 'top', 'where', 'test',], help="skills or inventory")
+    parser.add_argument("faction", nargs='?', help="name of faction")
+    parser.add_argument("action", nargs='?', choices=list(COMMANDS), help="skills or inventory")
+    parser.add_argument("files", nargs='*', help="for diff: two saves, or one save to compare with its cached model")
+    parser.add_argument("--all", choices=ACTIONS + ['watch'], metavar='ACTION', help="run the action for every faction in the config")
+    parser.add_argument("--reports", nargs='+', choices=ACTIONS, default=WATCH_REPORTS, help="for watch: the reports to refresh")
+    parser.add_argument("--workers", help="worker processes for --all", type=int)
+    parser.add_argument("--jobs", help="parse one save's things lists in this many processes", type=int)
     parser.add_argument("--quantity", help="How ever many of whatever, not for everything", type=int)
+    parser.add_argument("--no-cache", help="Parse the save even if a cached model is current", action='store_true')
+    parser.add_argument("--history", help="record the save in the history, which decodes every pawn", action='store_true')
+    parser.add_argument("--profile", help="print per-phase timings, call counts and peak RSS to stderr", action='store_true')
+    parser.add_argument("--profile-memory", help="--profile, also tracing peak Python memory, which makes the run several times slower", action='store_true')
+    parser.add_argument("--profile-dump", metavar='FILE', help="write cProfile stats for pstats to FILE")
+    parser.add_argument("--format", choices=render.FORMATS, default='terminal', help="how to write the report")
+    parser.add_argument("--output", metavar='FILE', help="write the report to FILE instead of stdout")
     args = parser.parse_args()
+    if not args.all and not args.action:
+        parser.error('a faction and action, or --all ACTION, are required')
+    # --all and watch print to the terminal, as their reports come and go
+    if args.format != 'terminal' and (args.all or args.action == 'watch'):
+        parser.error(f"--format {args.format} is for the reports and diff of one faction")
+    if (args.profile or args.profile_memory or args.profile_dump) and (args.all or args.action == 'watch'):
+        parser.error("--profile, --profile-memory and --profile-dump are for the reports and diff of one faction")
     run(args)
+
+if __name__ == '__main__':
+    # Run as the parse module, not __main__, so cached models name their classes
+    # parse.Thing and so on whichever script wrote them
+    import parse
+    parse.main()
@@ -3,16 +3,17 @@
 from argparse import ArgumentParser
 from configparser import ConfigParser
 import os
-import shutil
 import time
 
-from parse import CONFIG
+from config import CONFIG, factions
+import headers
+import snapshots
 
-def add_new_remove_absent(old_config):
+def add_new_remove_absent(old_config, auto=False):
     new_config = ConfigParser()
-    new_config.add_section('path')
+    # Keeps the other path options, such as the game folder for its Defs
+    new_config['path'] = old_config['path']
     save_dir = old_config['path']['saves']
-    new_config['path']['saves'] = save_dir
     rws_files = set()
     for filename in os.listdir(save_dir):
         if filename.endswith('rws'):
@@ -24,21 +25,31 @@ def add_new_remove_absent(old_config):
                 new_config[section] = old_config[section]
         except KeyError:
             continue
-    for rws in rws_files:
-        print('Name for {}:'.format(rws))
-
-        name = input()
+    started = time.perf_counter()
+    # Counting colonists reads each save through, so it is only done for saves a person is naming
+    scanned = headers.scan(sorted(rws_files), () if auto else rws_files)
+    print(f"Scanned {len(scanned)} new saves in {time.perf_counter() - started:.2f}s")
+    for rws in sorted(rws_files):
+        header = scanned.get(rws)
+        suggestion = unused_name(header.suggested_name() if header else os.path.basename(rws), new_config)
+        if auto:
+            name = suggestion
+            print(f"{rws} is {name}")
+        else:
+            print('Name for {} ({}):'.format(rws, header.describe() if header else 'unreadable'))
+            name = input(f"[{suggestion}] ") or suggestion
         new_config[name] = {'file': rws}
     with open(CONFIG, 'w') as f:
         new_config.write(f)
 
-def factions(old_config):
-    to_return = list()
-    skip = ('DEFAULT', 'path',)
-    for x in old_config:
-        if x not in skip:
-            to_return.append(x)
-    return to_return
+def unused_name(name, config):
+    """ name, or name with the first number after it that is not a section of config yet """
+    candidate = name
+    count = 1
+    while candidate in config:
+        count += 1
+        candidate = f"{name}_{count}"
+    return candidate
 
 def choose_faction(fs):
     print('Choose faction:')
@@ -50,14 +61,31 @@ def choose_faction(fs):
         return choose_faction(fs)
     return faction
 
+def age(seconds):
+    if seconds < 60*60:
+        return f"{seconds // 60:.0f} minutes ago"
+    if seconds < 48*60*60:
+        return f"{seconds // (60*60):.0f} hours ago"
+    return f"{seconds // (24*60*60):.0f} days ago"
+
+def choose_generation(manifests):
+    print('Choose generation:')
+    for number, manifest in enumerate(manifests, 1):
+        saved = time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest['mtime']))
+        print(f"  {number:2}  {saved}  {age(time.time() - manifest['mtime']):>16}  {manifest['size'] / 2**20:7.1f} MB")
+    choice = input('Generation (1): ') or '1'
+    if not choice.isdigit() or not 1 <= int(choice) <= len(manifests):
+        print('Not a generation')
+        return choose_generation(manifests)
+    return manifests[int(choice) - 1]
+
 def run(args):
     old_config = ConfigParser()
     old_config.read(CONFIG)
     if args.action == 'list':
-        skip = ('DEFAULT', 'path',)
         for faction in factions(old_config):
             print(faction)
-    if args.action in ('save', 'restore'):
+    elif args.action in ('save', 'restore'):
         fs = factions(old_config)
         if args.f:
             faction = args.f
@@ -69,23 +97,35 @@ def run(args):
         else:
             faction = choose_faction(fs)
         orig_file = old_config[faction]['file']
-        backup_file = f"{old_config[faction]['file']}.bu"
         if args.action == 'save':
-            shutil.copy(orig_file, backup_file)
+            started = time.perf_counter()
+            manifest, written = snapshots.save(faction, orig_file, args.keep)
+            print(f"{os.path.basename(manifest['path'])[:-len('.json')]}: {len(manifest['chunks'])} chunks, "
+                f"{written / 2**20:.1f} MB written in {time.perf_counter() - started:.2f}s")
         else:
-            if not os.path.exists(backup_file):
-                print(f"No backup file for {faction} exists")
+            manifests = snapshots.generations(faction)
+            if not manifests:
+                print(f"No snapshots for {faction} exist")
+                if os.path.exists(f"{orig_file}.bu"):
+                    print(f"The backup from before snapshots is {orig_file}.bu")
                 return
-            if time.time() - os.path.getmtime(backup_file) > 24*60*60:
-                if input("This backup file is over one day old. Continue? (y/N)  ") != 'y':
+            if args.g:
+                if not 1 <= args.g <= len(manifests):
+                    print(f"{faction} has {len(manifests)} generations")
                     return
-            shutil.copy2(backup_file, orig_file)
+                manifest = manifests[args.g - 1]
+            else:
+                manifest = choose_generation(manifests)
+            snapshots.restore(manifest, orig_file)
     else:
-        add_new_remove_absent(old_config)
+        add_new_remove_absent(old_config, args.auto)
 
 if __name__ == '__main__':
     parser = ArgumentParser()
     parser.add_argument('action', choices=('list', 'reset', 'save', 'restore'))
     parser.add_argument("-f", help="faction for save/restore")
+    parser.add_argument("-g", type=int, help="generation to restore, 1 being the newest")
+    parser.add_argument("--auto", action='store_true', help="reset: name new saves after their colonies without asking")
+    parser.add_argument("--keep", type=int, default=snapshots.KEEP_GENERATIONS, help="generations kept by save")
     args = parser.parse_args()
     run(args)
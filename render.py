@@ -0,0 +1,50 @@
+""" Writes report data as JSON, CSV, Parquet or Arrow instead of for the terminal"""
+import csv
+import io
+import json
+import sys
+
+FORMATS = ('terminal', 'json', 'csv', 'parquet', 'arrow',)
+# Written with pyarrow, to a file
+BINARY_FORMATS = ('parquet', 'arrow',)
+
+def columns(rows):
+    """ Every key in the rows, in the order first seen """
+    return list(dict.fromkeys(key for row in rows for key in row))
+
+def to_json(data):
+    return json.dumps(data, indent=2) + '\n'
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns(rows), lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def arrow_table(rows):
+    try:
+        import pyarrow
+    except ImportError:
+        raise SystemExit('pyarrow is needed for parquet and arrow output')
+    return pyarrow.table({column: [row.get(column) for row in rows] for column in columns(rows)})
+
+def write(output_format, data, rows, path=None):
+    """ Writes the data (json) or its rows (everything else) to path, or stdout for the text formats, in one write """
+    if output_format in BINARY_FORMATS:
+        if not path:
+            raise SystemExit(f"{output_format} output needs --output")
+        table = arrow_table(rows)
+        if output_format == 'parquet':
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(table, path)
+        else:
+            import pyarrow.feather
+            pyarrow.feather.write_feather(table, path)
+        return
+    text = to_json(data) if output_format == 'json' else to_csv(rows)
+    if path:
+        with open(path, 'w', newline='') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+""" Serves the reports for the configured saves as JSON over local HTTP"""
+from argparse import ArgumentParser
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+import hashlib
+import json
+import os
+import sys
+from urllib.parse import urlsplit
+
+from config import Options
+import parse
+
+# Endpoint: the action whose data it serves
+ENDPOINTS = {
+    'pawns': 'skills',
+    'inventory': 'inventory',
+    'equipment': 'equipment',
+    'queue': 'queue',
+    'harvest': 'harvest',
+    'injuries': 'injury',
+    'quests': 'quests',
+    'top': 'top',
+}
+REASONS = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+class Save:
+    """ A faction's model, kept while the save's mtime and size are unchanged, and the endpoints rendered from it"""
+    def __init__(self, options):
+        self.options = Options(options)
+        self.path = options['file']
+        self.signature = None
+        self.model = None
+        self.bodies = {}
+        self.lock = asyncio.Lock()
+
+    def etag(self, signature, endpoint, query):
+        """ Changes when the save does, and differs by endpoint and query """
+        mtime, size = signature
+        digest = hashlib.blake2b(f"{mtime}-{size} {endpoint}?{query}".encode(), digest_size=8)
+        return f'"{digest.hexdigest()}"'
+
+class ReportServer:
+    def __init__(self, config):
+        self.saves = {faction: Save(config[faction]) for faction in parse.factions(config)}
+        # Loading and rendering are CPU bound, so one thread does them and the event loop stays free
+        self.executor = ThreadPoolExecutor(1)
+
+    async def load(self, save):
+        """ Reloads the model if the save has changed since it was loaded.
+        Returns the signature and model it was loaded for """
+        stat = os.stat(save.path)
+        signature = (stat.st_mtime_ns, stat.st_size,)
+        if save.signature != signature:
+            async with save.lock:
+                if save.signature != signature:
+                    loop = asyncio.get_running_loop()
+                    save.model = await loop.run_in_executor(self.executor, parse.load_model, save.path)
+                    save.signature = signature
+                    save.bodies = {}
+        return save.signature, save.model
+
+    def render(self, save, model, endpoint):
+        # Reports record the levels they saw in the options, so each render gets its own copy
+        return json.dumps(parse.report_data(ENDPOINTS[endpoint], model, Options(save.options))).encode()
+
+    async def body(self, save, signature, model, endpoint):
+        """ The endpoint rendered from the model loaded for signature. The save's lock is not held
+        while rendering, so the save can be reloaded meanwhile; the body is then not kept """
+        if endpoint not in save.bodies or save.signature != signature:
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(self.executor, self.render, save, model, endpoint)
+            if save.signature != signature:
+                return body
+            save.bodies[endpoint] = body
+        return save.bodies[endpoint]
+
+    async def warm(self):
+        for faction, save in self.saves.items():
+            try:
+                await self.load(save)
+            except Exception as e:
+                print(f"Could not load {faction}: {e!r}", file=sys.stderr)
+
+    def route(self, path):
+        """ The save and endpoint for /faction/endpoint, or /endpoint when there is only one save """
+        parts = [part for part in path.split('/') if part]
+        if len(parts) == 1 and len(self.saves) == 1:
+            parts = list(self.saves) + parts
+        if len(parts) != 2 or parts[0] not in self.saves or parts[1] not in ENDPOINTS:
+            return None, None
+        return self.saves[parts[0]], parts[1]
+
+    async def respond(self, method, target, headers):
+        """ Status, extra headers and body for a request """
+        if method not in ('GET', 'HEAD',):
+            return 405, {'Allow': 'GET, HEAD'}, error('only GET and HEAD are supported')
+        url = urlsplit(target)
+        path = url.path
+        if path == '/':
+            return 200, {}, json.dumps({'factions': list(self.saves), 'endpoints': list(ENDPOINTS)}).encode()
+        save, endpoint = self.route(path)
+        if save is None:
+            return 404, {}, error(f"no report at {path}")
+        try:
+            signature, model = await self.load(save)
+            # Checked before rendering, so a client that has the body costs no render
+            etag = save.etag(signature, endpoint, url.query)
+            if headers.get('if-none-match') == etag:
+                return 304, {'ETag': etag}, b''
+            body = await self.body(save, signature, model, endpoint)
+        except Exception as e:
+            return 500, {}, error(repr(e))
+        return 200, {'ETag': etag}, body
+
+    async def handle(self, reader, writer):
+        """ Answers requests on one connection until the client closes it or asks to """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b'',):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    method, target, version = None, None, 'HTTP/1.0'
+                    status, extra, body = 400, {}, error('malformed request line')
+                else:
+                    status, extra, body = await self.respond(method, target, headers)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                head = [
+                    f"HTTP/1.1 {status} {REASONS[status]}",
+                    'Content-Type: application/json',
+                    f"Content-Length: {len(body)}",
+                    'Cache-Control: no-cache',
+                    'Access-Control-Allow-Origin: *',
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                head.extend(f"{name}: {value}" for name, value in extra.items())
+                writer.write('\r\n'.join(head).encode('latin-1') + b'\r\n\r\n')
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def error(message):
+    return json.dumps({'error': message}).encode()
+
+async def serve(args):
+    config = ConfigParser()
+    config.read(parse.CONFIG)
+    report_server = ReportServer(config)
+    server = await asyncio.start_server(report_server.handle, args.host, args.port)
+    print(f"Serving {', '.join(report_server.saves)} on http://{args.host}:{args.port}/", file=sys.stderr)
+    asyncio.create_task(report_server.warm())
+    async with server:
+        await server.serve_forever()
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("--host", default='127.0.0.1', help="address to listen on")
+    parser.add_argument("--port", default=8765, type=int)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
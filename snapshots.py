@@ -0,0 +1,186 @@
+""" Generations of each faction's save, kept as compressed chunks that generations share"""
+import hashlib
+import json
+import mmap
+import os
+import time
+import zlib
+
+import stream
+
+SNAPSHOT_DIR = 'local/snapshots'
+CHUNK_DIR = os.path.join(SNAPSHOT_DIR, 'chunks')
+KEEP_GENERATIONS = 10
+# Outside the things lists, lines between cuts on average
+LINE_AVERAGE = 512
+ZSTD_LEVEL = 3
+# zstd, or zlib when zstandard is not installed
+SUFFIXES = ('.zst', '.z',)
+
+def line_cuts(buffer, start, end, average=LINE_AVERAGE):
+    """ Offsets of the lines in start:end whose opening bytes hash to 0 mod average """
+    cuts = []
+    pos = buffer.find(b'\n', start, end)
+    while pos != -1:
+        line = pos + 1
+        if zlib.crc32(buffer[line:min(line + 64, end)]) % average == 0:
+            cuts.append(line)
+        pos = buffer.find(b'\n', line, end)
+    return cuts
+
+def chunk_ranges(buffer):
+    """ Consecutive (start, end) ranges covering the save. The things lists are cut as for the
+    chunked model and everything else at lines picked by their content, so a change to the save
+    only changes the chunks around it"""
+    outside, ranges = stream.content_chunks(buffer)
+    for start, end in outside:
+        cuts = [start] + line_cuts(buffer, start, end) + [end]
+        ranges.extend(zip(cuts, cuts[1:]))
+    return sorted((start, end,) for start, end in ranges if end > start)
+
+def chunk_path(digest, suffix):
+    return os.path.join(CHUNK_DIR, digest[:2], digest + suffix)
+
+def find_chunk(digest):
+    for suffix in SUFFIXES:
+        path = chunk_path(digest, suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+def compressor():
+    """ Suffix and compress function for new chunks """
+    try:
+        import zstandard
+    except ImportError:
+        return '.z', zlib.compress
+    return '.zst', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+
+def write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+def read_chunk(digest):
+    """ The bytes of a chunk, checked against its digest """
+    path = find_chunk(digest)
+    if path is None:
+        raise SystemExit(f"Snapshot chunk {digest} is missing")
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit('zstandard is needed to restore zstd compressed snapshots')
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = zlib.decompress(data)
+    if hashlib.blake2b(data, digest_size=16).hexdigest() != digest:
+        raise SystemExit(f"Snapshot chunk {digest} is corrupt")
+    return data
+
+def newest_first(manifest):
+    """ Sort key putting later generations first. Names taken in the same second do not sort
+    in order, so generations are numbered; those from before the numbers go by when they were made """
+    return (-manifest.get('sequence', 0), -manifest['created'],)
+
+def generations(faction):
+    """ Manifests of the faction's generations, newest first """
+    directory = os.path.join(SNAPSHOT_DIR, faction)
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.json')]
+    except FileNotFoundError:
+        return []
+    manifests = []
+    for name in names:
+        with open(os.path.join(directory, name)) as f:
+            manifest = json.load(f)
+        manifest['path'] = os.path.join(directory, name)
+        manifests.append(manifest)
+    return sorted(manifests, key=newest_first)
+
+def save(faction, path, keep=KEEP_GENERATIONS):
+    """ Stores the save at path as the faction's newest generation, writing only chunks no generation has yet.
+    Returns the manifest and the bytes written; a save that matches the newest generation is not stored again"""
+    suffix, compress = compressor()
+    checksum = hashlib.blake2b()
+    chunks = []
+    written = 0
+    stat = os.stat(path)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer, memoryview(buffer) as view:
+        for start, end in chunk_ranges(buffer):
+            data = view[start:end]
+            checksum.update(data)
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            chunks.append((digest, end - start,))
+            if find_chunk(digest) is None:
+                compressed = compress(data)
+                write_atomically(chunk_path(digest, suffix), compressed)
+                written += len(compressed)
+            data.release()
+    existing = generations(faction)
+    if existing and existing[0]['checksum'] == checksum.hexdigest():
+        return existing[0], written
+    manifest = {
+        'file': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'created': time.time(),
+        'sequence': max((generation.get('sequence', 0) for generation in existing), default=0) + 1,
+        'checksum': checksum.hexdigest(),
+        'chunks': chunks,
+    }
+    name = time.strftime('%Y%m%d-%H%M%S')
+    manifest_path = os.path.join(SNAPSHOT_DIR, faction, f"{name}.json")
+    count = 1
+    while os.path.exists(manifest_path):
+        count += 1
+        manifest_path = os.path.join(SNAPSHOT_DIR, faction, f"{name}-{count}.json")
+    write_atomically(manifest_path, json.dumps(manifest).encode())
+    manifest['path'] = manifest_path
+    prune(faction, keep)
+    return manifest, written
+
+def restore(manifest, path):
+    """ Writes the generation out to path, replacing the save only once the whole file checks out """
+    temporary = f"{path}.restoring"
+    checksum = hashlib.blake2b()
+    try:
+        with open(temporary, 'wb') as f:
+            for digest, length in manifest['chunks']:
+                data = read_chunk(digest)
+                if len(data) != length:
+                    raise SystemExit(f"Snapshot chunk {digest} is {len(data)} bytes, not {length}")
+                checksum.update(data)
+                f.write(data)
+        if checksum.hexdigest() != manifest['checksum']:
+            raise SystemExit(f"{manifest['path']} does not restore to the save it was taken from")
+        os.utime(temporary, (manifest['mtime'], manifest['mtime'],))
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+def prune(faction, keep=KEEP_GENERATIONS):
+    """ Drops all but the newest `keep` generations, then the chunks no generation uses """
+    old = generations(faction)[keep:]
+    for manifest in old:
+        os.remove(manifest['path'])
+    if old:
+        collect()
+
+def collect():
+    """ Removes the chunks no generation of any faction refers to """
+    used = set()
+    for faction in os.listdir(SNAPSHOT_DIR):
+        if os.path.join(SNAPSHOT_DIR, faction) != CHUNK_DIR:
+            for manifest in generations(faction):
+                used.update(digest for digest, _ in manifest['chunks'])
+    for directory, _, names in os.walk(CHUNK_DIR):
+        for name in names:
+            digest, suffix = os.path.splitext(name)
+            if suffix in SUFFIXES and digest not in used:
+                os.remove(os.path.join(directory, name))
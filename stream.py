@@ -0,0 +1,275 @@
+""" Streaming reader for rws files. lxml is imported on the first read,
+so loading a cached model does not pay for it"""
+import bisect
+from contextlib import contextmanager
+import gzip
+import mmap
+import zlib
+
+# Subtrees kept from the save. Everything else is cleared as soon as it is parsed.
+# Pawns carry their own healthtracker, skills, apparel, etc.
+RECORD_TAGS = ('thing', 'pawnsalive', 'pawnsdead', 'quests', 'alldesignations', 'ticksgame',
+    'mapinfo', 'compressedthingmapdeflate', 'roofsdeflate', 'zonemanager',)
+
+def iter_records(source, tags=RECORD_TAGS):
+    """ Yields each record element, detached from the document, with lowercased tags """
+    from lxml import etree
+    record = None
+    for event, elem in etree.iterparse(source, events=('start', 'end',), remove_comments=True, remove_pis=True, huge_tree=True):
+        if event == 'start':
+            if record is None and elem.tag.lower() in tags:
+                record = elem
+            continue
+        if elem is record:
+            record = None
+            elem.getparent().remove(elem)
+            for child in elem.iter():
+                child.tag = child.tag.lower()
+            yield elem
+        elif record is None:
+            elem.clear()
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+def compression(path):
+    """ 'gzip', 'zstd' or None for a plain save """
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+def open_zstd(path):
+    try:
+        from compression import zstd
+        return zstd.open(path, 'rb')
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise SystemExit(f"{path} is zstd compressed, which needs the zstandard package")
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+def open_bytes(path):
+    """ The save as a binary file, decompressed as it is read if it is compressed """
+    kind = compression(path)
+    if kind == 'gzip':
+        return gzip.open(path, 'rb')
+    if kind == 'zstd':
+        return open_zstd(path)
+    return open(path, 'rb')
+
+@contextmanager
+def open_save(path):
+    """ A source for iter_records. Plain saves are passed by path, so libxml2 reads
+    them itself without copies through Python; compressed saves are decompressed as they are read"""
+    if compression(path) is None:
+        yield path
+        return
+    with open_bytes(path) as f:
+        yield f
+
+@contextmanager
+def save_buffer(path):
+    """ The whole save as bytes: mapped for plain saves, decompressed into memory otherwise"""
+    if compression(path) is None:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+    else:
+        with open_save(path) as f:
+            yield f.read()
+
+THINGS_OPEN = b'<things>'
+THINGS_CLOSE = b'</things>'
+THING_START = b'<thing Class='
+MAP_INFO = b'<mapInfo>'
+
+def things_sections(buffer):
+    """ (start, end) of the contents of each outermost <things> list that holds <thing Class=...> children """
+    sections = []
+    depth = 0
+    pos = 0
+    next_open = buffer.find(THINGS_OPEN)
+    while True:
+        next_close = buffer.find(THINGS_CLOSE, pos)
+        if next_close == -1:
+            break
+        if next_open != -1 and next_open < next_close:
+            if depth == 0:
+                start = next_open + len(THINGS_OPEN)
+            depth += 1
+            pos = next_open + len(THINGS_OPEN)
+            next_open = buffer.find(THINGS_OPEN, pos)
+        else:
+            depth -= 1
+            if depth == 0:
+                sections.append((start, next_close,))
+            pos = next_close + len(THINGS_CLOSE)
+    return [(start, end,) for start, end in sections if buffer.find(THING_START, start, end) != -1]
+
+def map_indices(buffer, positions):
+    """ Index of the map each byte position is in, counting the maps by their <mapInfo>, as SaveIndex does """
+    starts = []
+    pos = buffer.find(MAP_INFO)
+    while pos != -1:
+        starts.append(pos)
+        pos = buffer.find(MAP_INFO, pos + len(MAP_INFO))
+    return [max(bisect.bisect(starts, position) - 1, 0) for position in positions]
+
+def split_things(buffer, parts):
+    """ Cuts the things lists into about `parts` byte ranges, each starting at a <thing Class=...>.
+    Returns the ranges of everything else and the chunks """
+    sections = things_sections(buffer)
+    size = max(sum(end - start for start, end in sections) // parts, 1)
+    chunks = []
+    outside = []
+    pos = 0
+    for start, end in sections:
+        outside.append((pos, start,))
+        pos = end
+        while start < end:
+            cut = buffer.find(THING_START, start + size, end)
+            if cut == -1:
+                cut = end
+            chunks.append((start, cut,))
+            start = cut
+    outside.append((pos, len(buffer),))
+    return outside, chunks
+
+def content_chunks(buffer, average=256):
+    """ Like split_things, but whether to cut before a thing depends only on its opening bytes up to its id,
+    so adding or removing things only changes the chunks around them """
+    sections = things_sections(buffer)
+    chunks = []
+    outside = []
+    pos = 0
+    for start, end in sections:
+        outside.append((pos, start,))
+        pos = end
+        cut = buffer.find(THING_START, start, end)
+        while cut != -1:
+            id_end = buffer.find(b'</id>', cut, cut + 256)
+            if cut > start and zlib.crc32(buffer[cut:id_end if id_end != -1 else cut + 64]) % average == 0:
+                chunks.append((start, cut,))
+                start = cut
+            cut = buffer.find(THING_START, cut + len(THING_START), end)
+        chunks.append((start, end,))
+    outside.append((pos, len(buffer),))
+    return outside, chunks
+
+class RangeReader:
+    """ File-like reader over byte ranges of a buffer, in order, between an optional prefix and suffix.
+    Reads copy only what is asked for, so a chunk of a mapped save is never copied whole"""
+    def __init__(self, buffer, ranges, prefix=b'', suffix=b''):
+        self.buffer = buffer
+        self.ranges = list(ranges)
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def read(self, size=-1):
+        if size < 0:
+            data = b''.join([self.prefix] + [self.buffer[start:end] for start, end in self.ranges] + [self.suffix])
+            self.prefix = self.suffix = b''
+            self.ranges = []
+            return data
+        if self.prefix:
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            return data
+        while self.ranges:
+            start, end = self.ranges[0]
+            if end - start <= size:
+                self.ranges.pop(0)
+            else:
+                end = start + size
+                self.ranges[0] = (end, self.ranges[0][1],)
+            if end > start:
+                return self.buffer[start:end]
+        data, self.suffix = self.suffix[:size], self.suffix[size:]
+        return data
+
+class Fields:
+    """ The fields a record type reads, taken from a node in one pass over its children.
+    A field is a child tag, or a tuple of tags down to a descendant, compiled to XPath on first use.
+    Missing and empty fields are left out, so fields.get(field, default) reads like attribute()"""
+    def __init__(self, *fields):
+        self.tags = frozenset(field for field in fields if isinstance(field, str))
+        self.chain_fields = tuple(field for field in fields if not isinstance(field, str))
+        self.chains = None
+
+    def __call__(self, node):
+        if self.chains is None:
+            from lxml import etree
+            self.chains = tuple((field, etree.XPath('string({})'.format('/'.join(field))),) for field in self.chain_fields)
+        values = {}
+        for child in node.element:
+            if child.tag in self.tags and child.text and child.tag not in values:
+                values[child.tag] = child.text
+        for field, path in self.chains:
+            text = path(node.element)
+            if text:
+                values[field] = str(text)
+        return values
+
+def dump(node):
+    """ The xml of a node, or None without one, to keep in a model until it is needed """
+    from lxml import etree
+    return None if node is None else etree.tostring(node.element)
+
+def undump(data):
+    """ The node dumped as data """
+    from lxml import etree
+    return Node(etree.fromstring(data))
+
+class Node:
+    """ The part of the BeautifulSoup Tag interface the reports use, over an lxml element"""
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def __getattr__(self, tag):
+        if tag.startswith('__'):
+            raise AttributeError(tag)
+        return self.find(tag)
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.element is other.element
+
+    def __hash__(self):
+        return id(self.element)
+
+    @property
+    def name(self):
+        return self.element.tag
+
+    @property
+    def attrs(self):
+        attrs = {}
+        for k, v in self.element.attrib.items():
+            k = k.lower()
+            attrs[k] = v.split() if k == 'class' else v
+        return attrs
+
+    @property
+    def text(self):
+        return ''.join(self.element.itertext())
+
+    def find(self, tag, recursive=True):
+        if recursive:
+            found = next(self.element.iterdescendants(tag), None)
+        else:
+            found = self.element.find(tag)
+        return found is not None and Node(found) or None
+
+    def find_all(self, tag, recursive=True):
+        if recursive:
+            return [Node(e) for e in self.element.iterdescendants(tag)]
+        return [Node(e) for e in self.element.iterchildren(tag)]
@@ -0,0 +1,32 @@
+""" Small synthetic saves, and a working directory with a config for them"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bench
+
+@pytest.fixture(scope='session')
+def save(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('saves') / 'small.rws')
+    bench.generate(path, pawns=12, things=600, plants=300, basins=10, bills=10, designations=20)
+    return path
+
+@pytest.fixture
+def workdir(tmp_path, save):
+    """ A directory whose local/parse.cnf has the save as faction bench """
+    bench.write_config(str(tmp_path), save)
+    return tmp_path
+
+@pytest.fixture
+def run_parse(workdir):
+    """ Runs parse.py in workdir and returns its output, failing on a non-zero exit """
+    def run(*args):
+        result = subprocess.run([sys.executable, os.path.join(ROOT, 'parse.py'), *args], cwd=workdir, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+    return run
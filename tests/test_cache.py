@@ -0,0 +1,47 @@
+import os
+import shutil
+
+import pytest
+
+import cache
+from config import Options
+import parse
+
+def test_touched_save_is_hashed_once(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'copy.rws')
+    shutil.copy(save, path)
+    cache.store(path, 1, {'model': 'data'})
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9,))
+    hashed = []
+    content_hash = cache.content_hash
+    monkeypatch.setattr(cache, 'content_hash', lambda path: hashed.append(path) or content_hash(path))
+    assert cache.load(path, 1) == {'model': 'data'}
+    assert cache.load(path, 1) == {'model': 'data'}
+    assert len(hashed) == 1
+
+    with open(path, 'r+b') as f:
+        f.write(b'<?xml version="1.1"')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2*10**9,))
+    assert cache.load(path, 1) is None
+
+def test_restoring_does_not_hash(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache.store(save, 1, {'model': 'data'})
+    monkeypatch.setattr(cache, 'content_hash', lambda path: pytest.fail('hashed again'))
+    cache.store(save, 1, {'model': 'more data'})
+    assert cache.load(save, 1) == {'model': 'more data'}
+
+def test_cached_model_loads_things_when_used(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model = parse.load_model(save, use_cache=False)
+    expected = {action: parse.report_data(action, model, Options(), 3) for action in parse.ACTIONS if action != 'test'}
+    cache.store(save, 1, model)
+    cached = cache.load(save, 1)
+    assert set(cached._pickled) == set(parse.SaveModel.LAZY)
+    parse.report_data('animals', cached, Options(), 3)
+    assert set(cached._pickled) == set(parse.SaveModel.LAZY)
+    assert {action: parse.report_data(action, cached, Options(), 3) for action in expected} == expected
+    assert not cached._pickled
+    assert all(thing.hit_points is cached.hit_points for thing in cached.things)
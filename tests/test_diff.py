@@ -0,0 +1,15 @@
+import json
+
+import bench
+
+def test_diff_formats(save, workdir, run_parse):
+    later = str(workdir / 'later.rws')
+    bench.generate(later, pawns=12, things=650, plants=300, basins=10, bills=12, designations=20)
+    data = json.loads(run_parse('bench', 'diff', save, later, '--format', 'json'))
+    things = data['things']
+    assert run_parse('bench', 'diff', save, later).startswith(
+        f"Things: {sum(things['added'].values())} added, {sum(things['removed'].values())} removed, {things['changed']} changed\n")
+    assert data['bills']
+    rows = run_parse('bench', 'diff', save, later, '--format', 'csv').splitlines()
+    assert rows[0].startswith('section,')
+    assert sum(row.startswith('bills,') for row in rows[1:]) == len(data['bills'])
@@ -0,0 +1,57 @@
+from collections import deque
+import random
+
+import numpy
+
+import bench
+import mapgrids
+import parse
+
+def bfs_label(open_cells):
+    """ 4-connected components numbered in row order, one cell at a time """
+    height, width = open_cells.shape
+    labels = numpy.zeros(open_cells.shape, numpy.int32)
+    count = 0
+    for z in range(height):
+        for x in range(width):
+            if not open_cells[z, x] or labels[z, x]:
+                continue
+            count += 1
+            labels[z, x] = count
+            queue = deque([(z, x,)])
+            while queue:
+                cz, cx = queue.popleft()
+                for nz, nx in ((cz - 1, cx,), (cz + 1, cx,), (cz, cx - 1,), (cz, cx + 1,)):
+                    if 0 <= nz < height and 0 <= nx < width and open_cells[nz, nx] and not labels[nz, nx]:
+                        labels[nz, nx] = count
+                        queue.append((nz, nx,))
+    return labels
+
+def test_label_matches_bfs():
+    r = random.Random(0)
+    for _ in range(200):
+        shape = (r.randint(1, 40), r.randint(1, 40),)
+        open_cells = numpy.array([[r.random() < r.choice((.3, .5, .6, .8,)) for _ in range(shape[1])] for _ in range(shape[0])])
+        assert numpy.array_equal(mapgrids.label(open_cells), bfs_label(open_cells))
+
+def things(model):
+    return [(thing.id, thing.map,) for thing in model.things]
+
+def test_rooms_of_each_map(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'maps.rws')
+    bench.generate(path, pawns=6, things=300, plants=50, basins=2, bills=2, designations=5, maps=2)
+    model = parse.load_model(path, use_cache=False)
+    assert sorted(model.rooms) == [0, 1]
+    assert {thing.map for thing in model.things} == {0, 1}
+    for map_index, rooms in model.rooms.items():
+        # Each map has its own shrines, and none of their loot is left
+        assert rooms.sealed.any()
+        on_map = [thing.position for thing in model.things if thing.map == map_index]
+        assert not rooms.sealed[rooms.cells(on_map)].any()
+    assert [row['map'] for row in parse.where_data(model)].count(1) == len([thing for thing in model.things if thing.map == 1])
+
+    assert things(parse.parallel_model(path, 2)) == things(model)
+    chunked, parts = parse.chunked_model(path)
+    assert things(chunked) == things(model)
+    assert things(parse.chunked_model(path, parts)[0]) == things(model)
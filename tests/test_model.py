@@ -0,0 +1,31 @@
+import parse
+
+def test_maxes_count_colonists_gear(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model = parse.load_model(save, use_cache=False)
+    assert model.prisoners
+    expected = dict(model.maxes)
+    # Asking for any maximum decodes the colonists' gear
+    model.hit_points['']
+    for pawn in model.colonists:
+        for item in pawn.items.values():
+            if hasattr(item, 'record_health'):
+                item.record_health(expected)
+    for pawn in model.prisoners + model.dead:
+        pawn.items
+    assert model.maxes == expected
+
+def test_inventory_counts_colonists_gear(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model = parse.load_model(save, use_cache=False)
+    loose = dict(model.maxes)
+    parse.things_in_inventory(model)
+    assert all(pawn._items is not None for pawn in model.colonists)
+    assert model.maxes != loose
+
+def test_bench_saves_have_animals(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model = parse.load_model(save, use_cache=False)
+    assert model.animals
+    assert model.wildlife
+    assert 'Human' not in model.animals + model.wildlife
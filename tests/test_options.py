@@ -0,0 +1,78 @@
+from configparser import ConfigParser
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+import classify
+from config import Options
+from parse import SKILLS
+
+PARSE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'parse.py')
+
+def read_config(workdir):
+    config = ConfigParser()
+    config.read(os.path.join(workdir, 'local', 'parse.cnf'))
+    return config
+
+def write_config(workdir, config):
+    with open(os.path.join(workdir, 'local', 'parse.cnf'), 'w') as f:
+        config.write(f)
+
+def mark_non_violent(workdir):
+    """ Marks the first recorded pawn incapable of shooting and melee, and returns its name """
+    config = read_config(workdir)
+    name = next(key for key in config['bench'] if key != 'file')
+    levels = config['bench'][name].split(',')
+    for skill in ('Shooting', 'Melee',):
+        levels[SKILLS.index(skill)] = 'X'
+    config['bench'][name] = ','.join(levels)
+    write_config(workdir, config)
+    return name
+
+def test_options_are_case_insensitive():
+    options = Options({'file': 'a.rws', 'human71': '1,2'})
+    assert options['Human71'] == '1,2'
+    assert options.get('HUMAN71') == '1,2'
+    assert 'Human71' in options
+    options['Human72'] = '3'
+    assert list(options) == ['file', 'human71', 'human72']
+    assert pickle.loads(pickle.dumps(options)) == options
+
+def test_all_skills_twice(workdir, run_parse):
+    run_parse('--all', 'skills')
+    name = mark_non_violent(workdir)
+    run_parse('--all', 'skills')
+    run_parse('--all', 'skills')
+    config = read_config(workdir)
+    assert config['bench'][name].split(',')[SKILLS.index('Shooting')] == 'X'
+    assert sum(1 for key in config['bench'] if key.lower() == name) == 1
+
+def test_all_keeps_non_violent(workdir, run_parse):
+    run_parse('--all', 'skills')
+    name = mark_non_violent(workdir)
+    single = run_parse('bench', 'equipment')
+    batch = run_parse('--all', 'equipment')
+    assert single.count('(Non Violent)') == 1
+    assert batch.count('(Non Violent)') == 1
+
+def test_profile_is_for_one_faction(workdir):
+    profiled = subprocess.run([sys.executable, PARSE, 'bench', 'skills', '--profile'], cwd=workdir, capture_output=True, text=True)
+    assert profiled.returncode == 0
+    assert 'Peak RSS' in profiled.stderr
+    assert 'Peak Python memory' not in profiled.stderr
+    batch = subprocess.run([sys.executable, PARSE, '--all', 'skills', '--profile'], cwd=workdir, capture_output=True, text=True)
+    assert batch.returncode != 0
+    assert 'one faction' in batch.stderr
+
+def test_prefix_without_category_is_a_config_error(tmp_path):
+    path = tmp_path / 'items.cnf'
+    path.write_text('[prefixes]\nMeat_ = Raw Food, Meat\nRaw\n')
+    with pytest.raises(SystemExit, match=r'Raw in \[prefixes\] needs a category'):
+        classify.Classifier.from_config(str(path))
+    path.write_text('[prefixes]\nPlant_ = Plants\n[items]\nKibble = Meal\n')
+    classifier = classify.Classifier.from_config(str(path))
+    assert classifier('Plant_Rice')[:2] == ('Plants', 'Rice',)
+    assert classifier('Kibble')[0] == 'Meal'
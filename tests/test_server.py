@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+from parse import SKILLS
+from test_options import mark_non_violent, read_config, write_config
+
+def zero_levels(workdir, skip):
+    """ Records the first pawn other than skip at level 0 in everything, so renders show it changed """
+    config = read_config(workdir)
+    name = next(key for key in config['bench'] if key not in ('file', skip,))
+    config['bench'][name] = ','.join('0' for _ in SKILLS)
+    write_config(workdir, config)
+
+def get(report_server, path):
+    status, _, body = asyncio.run(report_server.respond('GET', path, {}))
+    assert status == 200, body
+    return json.loads(body)
+
+def test_renders_keep_config_levels(workdir, run_parse, monkeypatch):
+    run_parse('bench', 'skills')
+    name = mark_non_violent(workdir)
+    zero_levels(workdir, name)
+    monkeypatch.chdir(workdir)
+    report_server = server.ReportServer(read_config(workdir))
+    first = get(report_server, '/bench/pawns')
+    pawn = next(pawn for pawn in first['colonists'] if pawn['name'].lower() == name)
+    assert pawn['skills']['Shooting']['level'] == 'X'
+    assert any(pawn['changes'] for pawn in first['colonists'])
+    # Rendering again must not see the first render's levels as the recorded ones
+    report_server.saves['bench'].bodies.clear()
+    assert get(report_server, '/bench/pawns') == first
+    equipment = get(report_server, '/bench/equipment')
+    assert [pawn['combat_info'] for pawn in equipment if pawn['name'].lower() == name] == ['(Non Violent)']
+
+def test_not_modified_is_not_rendered(workdir, monkeypatch):
+    monkeypatch.chdir(workdir)
+    report_server = server.ReportServer(read_config(workdir))
+    _, head, _ = asyncio.run(report_server.respond('GET', '/bench/queue', {}))
+    _, other, _ = asyncio.run(report_server.respond('GET', '/bench/queue?all', {}))
+    assert head['ETag'] != other['ETag']
+    report_server.saves['bench'].bodies.clear()
+    monkeypatch.setattr(report_server, 'render', lambda save, model, endpoint: pytest.fail('rendered'))
+    status, extra, body = asyncio.run(report_server.respond('GET', '/bench/queue', {'if-none-match': head['ETag']}))
+    assert (status, extra, body,) == (304, head, b'',)
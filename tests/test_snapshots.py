@@ -0,0 +1,32 @@
+import os
+
+import snapshots
+
+def write(path, version):
+    with open(path, 'w') as f:
+        f.write(''.join(f"<li>line {n} of version {version}</li>\n" for n in range(2000)))
+
+def test_generations_saved_in_one_second(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Every generation is named for the same second, so they take -2, -3 suffixes
+    monkeypatch.setattr(snapshots.time, 'strftime', lambda fmt: '20260101-120000')
+    path = str(tmp_path / 'colony.rws')
+    for version in range(4):
+        write(path, version)
+        snapshots.save('colony', path)
+    manifests = snapshots.generations('colony')
+    assert [os.path.basename(manifest['path']) for manifest in manifests] == [
+        '20260101-120000-4.json', '20260101-120000-3.json', '20260101-120000-2.json', '20260101-120000.json',]
+
+    # The save matches the newest generation, so it is not stored again
+    manifest, _ = snapshots.save('colony', path)
+    assert manifest['path'] == manifests[0]['path']
+    assert len(snapshots.generations('colony')) == 4
+
+    write(path, 'lost')
+    snapshots.restore(snapshots.generations('colony')[0], path)
+    with open(path) as f:
+        assert 'version 3<' in f.read()
+
+    snapshots.prune('colony', keep=2)
+    assert [manifest['path'] for manifest in snapshots.generations('colony')] == [manifest['path'] for manifest in manifests[:2]]
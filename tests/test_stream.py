@@ -0,0 +1,57 @@
+import os
+
+import bench
+from config import Options
+import history
+import parse
+import stream
+
+def read_all(reader, size):
+    data = []
+    while True:
+        part = reader.read(size)
+        if not part:
+            return b''.join(data)
+        assert len(part) <= size
+        data.append(part)
+
+def test_range_reader_small_reads():
+    buffer = bytes(range(256)) * 4
+    ranges = [(0, 3,), (3, 3,), (10, 17,), (100, 101,), (500, 1024,)]
+    expected = b''.join(buffer[start:end] for start, end in ranges)
+    for size in (1, 2, 3, 5, 7, 64, 4096,):
+        assert read_all(stream.RangeReader(buffer, ranges), size) == expected
+        assert read_all(stream.RangeReader(buffer, ranges, b'<things>', b'</things>'), size) == b'<things>' + expected + b'</things>'
+    reader = stream.RangeReader(memoryview(buffer), ranges, b'<', b'>')
+    assert bytes(reader.read(1)) + bytes(reader.read(4)) + bytes(reader.read()) == b'<' + expected + b'>'
+
+def reports(model):
+    return {action: parse.report_data(action, model, Options(), 3) for action in parse.ACTIONS if action != 'test'}
+
+def test_reused_chunks_match_fresh_extraction(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    later = str(tmp_path / 'later.rws')
+    bench.generate(later, pawns=12, things=650, plants=300, basins=10, bills=12, designations=20)
+    earlier, parts = parse.chunked_model(save)
+    # Reports decode the pawns' gear, which the reused parts then carry
+    reports(earlier)
+    reused, current = parse.chunked_model(later, parts)
+    assert set(parts) & set(current)
+    fresh, _ = parse.chunked_model(later)
+    serial = parse.load_model(later, use_cache=False)
+    assert reports(reused) == reports(fresh) == reports(serial)
+    assert reused.maxes == fresh.maxes == serial.maxes
+
+def test_watch_records_changed_saves_only(save, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    recorded = []
+    monkeypatch.setattr(history, 'record', lambda faction, path, model: recorded.append(faction))
+    watched = parse.WatchedSave('bench', Options({'file': save}), ['skills'], record_history=True)
+    watched.refresh()
+    # Touching the save without changing it
+    os.utime(save)
+    watched.refresh()
+    assert recorded == ['bench']
+    quiet = parse.WatchedSave('bench', Options({'file': save}), ['skills'])
+    quiet.refresh()
+    assert recorded == ['bench']
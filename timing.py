@@ -0,0 +1,81 @@
+""" Per-phase timings, call counts and peak memory for parse.py --profile"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import functools
+import resource
+import sys
+import time
+import tracemalloc
+
+enabled = False
+phases = defaultdict(float)
+calls = Counter()
+# [phase, time it last started or resumed], innermost last
+stack = []
+
+def enable(trace_memory=False):
+    """ Starts collecting. Tracing Python memory makes everything several times slower,
+    so the timings of a run that traces it are only rough"""
+    global enabled
+    enabled = True
+    if trace_memory:
+        tracemalloc.start()
+
+@contextmanager
+def phase(name):
+    """ Charges the time spent inside to name. Nested phases are not charged to their parent."""
+    if not enabled:
+        yield
+        return
+    now = time.perf_counter()
+    if stack:
+        phases[stack[-1][0]] += now - stack[-1][1]
+    stack.append([name, now])
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        name, since = stack.pop()
+        phases[name] += now - since
+        if stack:
+            stack[-1][1] = now
+
+def timed(iterable, name):
+    """ Charges the time spent producing each item to name """
+    if not enabled:
+        return iterable
+    def generate():
+        iterator = iter(iterable)
+        while True:
+            with phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    return generate()
+
+def count_calls(module, names):
+    """ Replaces the named module functions with ones that count their calls """
+    def counter(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            calls[func.__name__] += 1
+            return func(*args, **kwargs)
+        return wrapper
+    for name in names:
+        setattr(module, name, counter(getattr(module, name)))
+
+def summary(out=sys.stderr):
+    total = sum(phases.values())
+    print(f"\n{'Phase':20} {'Seconds':>9} {'%':>6}", file=out)
+    for name, seconds in sorted(phases.items(), key=lambda x: x[1], reverse=True):
+        print(f"{name:20} {seconds:9.3f} {100*seconds/(total or 1):6.1f}", file=out)
+    print(f"{'total':20} {total:9.3f}", file=out)
+    if calls:
+        print(f"\n{'Function':20} {'Calls':>9}", file=out)
+        for name, count in calls.most_common():
+            print(f"{name:20} {count:9}", file=out)
+    if tracemalloc.is_tracing():
+        print(f"\nPeak Python memory   {tracemalloc.get_traced_memory()[1] / 2**20:9.1f} MB", file=out)
+    print(f"Peak RSS             {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10:9.1f} MB", file=out)
@@ -0,0 +1,73 @@
+""" Waits for saves to be written, with inotify when inotify_simple is installed and by polling otherwise"""
+import os
+import time
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+POLL_SECONDS = 2.0
+SETTLE_SECONDS = 1.0
+SAVE_END = b'</savegame>'
+# gzip and zstd
+COMPRESSED_MAGIC = (b'\x1f\x8b', b'\x28\xb5\x2f\xfd',)
+
+def signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def complete(path):
+    """ Whether the save has been written out to its closing tag. Compressed saves are taken as complete """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(4).startswith(COMPRESSED_MAGIC):
+                return True
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 64, 0))
+            return SAVE_END in f.read()
+    except OSError:
+        return False
+
+class Watcher:
+    """ Tells when watched saves have been written and then left alone for `settle` seconds,
+    so a save that is still being written is not read"""
+    def __init__(self, paths, poll=POLL_SECONDS, settle=SETTLE_SECONDS):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.poll = poll
+        self.settle = settle
+        self.signatures = {path: signature(path) for path in self.paths}
+        self.inotify = None
+        if INotify is not None:
+            self.inotify = INotify()
+            # The directory rather than the file, so saves replaced by a rename are still seen
+            for directory in {os.path.dirname(path) for path in self.paths}:
+                self.inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.MODIFY)
+
+    def block(self, timeout):
+        """ Returns after the next filesystem event, or after timeout seconds """
+        if self.inotify is not None:
+            self.inotify.read(timeout=int(timeout * 1000))
+        else:
+            time.sleep(timeout)
+
+    def wait(self):
+        """ Blocks until at least one save has changed and settled. Returns the changed paths """
+        while True:
+            changed = [path for path in self.paths if signature(path) != self.signatures[path]]
+            if changed:
+                break
+            self.block(self.poll)
+        for path in changed:
+            while True:
+                before = signature(path)
+                time.sleep(self.settle)
+                if self.inotify is not None:
+                    self.inotify.read(timeout=0)
+                if before is None or signature(path) == before and complete(path):
+                    break
+            self.signatures[path] = signature(path)
+        return changed